@@ -0,0 +1,208 @@
+"""
+Antecedent Graph
+The antecedents of the proof steps in compressed sparse row form, saved
+in a binary file that is memory-mapped back without parsing, and a
+converter from the .rup files of `AntecedentWriter`.
+"""
+
+from typing import Dict, List, Optional
+from array import array
+import mmap
+import struct
+import sys
+from antecedent_writer import read_antecedents
+from step_index import StepIndex
+
+MAGIC = b"SMOLCSR1"
+# magic, first and last step id, number of antecedents, whether step types follow
+HEADER = struct.Struct("=8s4q")
+
+
+class AntecedentGraph:
+    """
+    The antecedents of step i are `antecedents[offsets[i]:offsets[i+1]]`
+    for the ids from `first` to `last`, steps without an entry in between
+    have none. `types` holds the step type of each id as a byte, 0 if
+    unknown, or is None.
+    """
+    def __init__(self, first: int, last: int, offsets, antecedents, types=None):
+        self.first = first
+        self.last = last
+        self.offsets = offsets
+        self.antecedents = antecedents
+        self.types = types
+        self.file = None
+        self.data = None
+
+    @classmethod
+    def from_dict(cls, graph: Dict[int, List[int]], types: Dict[int, str] = None) -> 'AntecedentGraph':
+        """
+        :param: graph: the antecedents by step id, as returned by `read_antecedents`
+        :param: types: the step types by id, if known
+        """
+        first = min(graph, default=1)
+        last = max(graph, default=0)
+        offsets = array("q", [0])
+        antecedents = array("q")
+        for id in range(last + 1):
+            antecedents.extend(graph.get(id, ()))
+            offsets.append(len(antecedents))
+        step_types = None
+        if types is not None:
+            step_types = bytearray(last + 1)
+            for id, type in types.items():
+                if id <= last and type:
+                    step_types[id] = ord(type)
+        return cls(first, last, offsets, antecedents, step_types)
+
+    def antecedents_of(self, id: int) -> List[int]:
+        if not self.first <= id <= self.last:
+            return []
+        return self.antecedents[self.offsets[id]:self.offsets[id + 1]].tolist()
+
+    def type(self, id: int) -> Optional[str]:
+        if self.types is None or not 0 <= id <= self.last or not self.types[id]:
+            return None
+        return chr(self.types[id])
+
+    def save(self, filename: str) -> None:
+        """
+        Writes the graph in native byte order.
+        """
+        with open(filename, mode="wb") as file:
+            file.write(HEADER.pack(MAGIC, self.first, self.last, len(self.antecedents), self.types is not None))
+            file.write(self.offsets.tobytes())
+            file.write(self.antecedents.tobytes())
+            if self.types is not None:
+                file.write(self.types)
+
+    @classmethod
+    def open(cls, filename: str) -> 'AntecedentGraph':
+        """
+        :return: the graph over the memory-mapped file written by `save`, its
+            arrays are views of the file that NumPy can wrap with `np.frombuffer`.
+        :raises ValueError: if the file is not a complete graph.
+        """
+        file = open(filename, mode="rb")
+        try:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            file.close()
+            raise ValueError("Empty antecedent graph: " + filename)
+        if len(data) < HEADER.size or data[:len(MAGIC)] != MAGIC:
+            data.close()
+            file.close()
+            raise ValueError("Not an antecedent graph: " + filename)
+        _, first, last, no_of_antecedents, has_types = HEADER.unpack_from(data)
+        size = HEADER.size + 8 * (last + 2 + no_of_antecedents) + (last + 1 if has_types else 0)
+        if len(data) != size:
+            data.close()
+            file.close()
+            raise ValueError("Truncated antecedent graph: " + filename)
+        view = memoryview(data)
+        offset = HEADER.size
+        offsets = view[offset:offset + 8 * (last + 2)].cast("q")
+        offset += 8 * (last + 2)
+        antecedents = view[offset:offset + 8 * no_of_antecedents].cast("q")
+        offset += 8 * no_of_antecedents
+        types = view[offset:offset + last + 1] if has_types else None
+        graph = cls(first, last, offsets, antecedents, types)
+        graph.file = file
+        graph.data = data
+        return graph
+
+    def close(self) -> None:
+        if self.data is not None:
+            # the views have to go before the map can be closed
+            self.offsets = self.antecedents = self.types = None
+            self.data.close()
+            self.file.close()
+            self.data = None
+
+    def __enter__(self) -> 'AntecedentGraph':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def reachable(graph: AntecedentGraph, root: int = None) -> bytearray:
+    """
+    :param: root: the step to start from, the last step by default
+    :return: flags by id, set for the steps the root depends on and the root itself.
+    """
+    if root is None:
+        root = graph.last
+    offsets = graph.offsets
+    antecedents = graph.antecedents
+    first, last = graph.first, graph.last
+    visited = bytearray(max(root, last, max(antecedents, default=0)) + 1)
+    visited[root] = 1
+    stack = [root]
+    append = stack.append
+    while stack:
+        node = stack.pop()
+        if first <= node <= last:
+            for antecedent in antecedents[offsets[node]:offsets[node + 1]]:
+                if not visited[antecedent]:
+                    visited[antecedent] = 1
+                    append(antecedent)
+    return visited
+
+
+def core_ids(graph: AntecedentGraph, root: int = None) -> array:
+    """
+    :return: the ids of the steps the root depends on and the root, in increasing order.
+    """
+    visited = reachable(graph, root)
+    ids = array("q")
+    id = visited.find(1)
+    while id >= 0:
+        ids.append(id)
+        id = visited.find(1, id + 1)
+    return ids
+
+
+def last_uses(graph: AntecedentGraph, visited: bytearray) -> array:
+    """
+    :param: visited: the flags of the steps that are kept, from `reachable`
+    :return: by id, the last kept step that has it as an antecedent, 0 if there is none.
+    """
+    offsets = graph.offsets
+    antecedents = graph.antecedents
+    uses = array("q", bytes(8 * len(visited)))
+    id = visited.find(1, graph.first)
+    while 0 <= id <= graph.last:
+        for antecedent in antecedents[offsets[id]:offsets[id + 1]]:
+            uses[antecedent] = id
+        id = visited.find(1, id + 1)
+    return uses
+
+
+def load_graph(filename: str) -> AntecedentGraph:
+    """
+    :param: filename: a binary graph, or a .rup file in either format
+    :return: the graph, memory-mapped if the file is a binary graph.
+    """
+    with open(filename, mode="rb") as file:
+        is_graph = file.read(len(MAGIC)) == MAGIC
+    if is_graph:
+        return AntecedentGraph.open(filename)
+    return AntecedentGraph.from_dict(read_antecedents(filename))
+
+
+def convert(rup_file: str, graph_file: str, proof_file: str = None) -> None:
+    """
+    Converts a .rup file in either format to a binary graph, with the
+    step types of the `proof_file` if it is given.
+    """
+    types = None
+    if proof_file is not None:
+        index = StepIndex.open(proof_file)
+        types = {index.no_of_formulas + 1 + step: chr(type) for step, type in enumerate(index.types)}
+    AntecedentGraph.from_dict(read_antecedents(rup_file), types).save(graph_file)
+
+
+if "__main__" == __name__:
+    # python antecedent_graph.py rup/g2-g3.rup rup/g2-g3.csr [sip_proofs/g2-g3.veripb]
+    convert(*sys.argv[1:4])
@@ -0,0 +1,94 @@
+"""
+Antecedent Writer
+Buffered writer for the .rup files recording the antecedents of each
+proof step, owned and closed by the model writing it.
+"""
+
+from typing import Dict, Iterable, List
+from array import array
+
+MAGIC = b"SMOLRUP1"
+# values buffered before a binary file is written to
+BUFFER_SIZE = 1 << 16
+
+
+class AntecedentWriter:
+    """
+    Writes the antecedents of the proof steps, either as text lines
+    `id:antecedents` or, if `binary`, as unsigned 32 bit integers after
+    `MAGIC`: the id, the number of antecedents and the antecedents of each step.
+    """
+    def __init__(self, filename: str, binary: bool = False):
+        self.binary = binary
+        if binary:
+            self.file = open(filename, mode="wb")
+            self.file.write(MAGIC)
+            self.buffer = array("I")
+        else:
+            self.file = open(filename, mode="w", buffering=BUFFER_SIZE)
+
+    def write(self, id: int, antecedents: Iterable[int]) -> None:
+        if self.binary:
+            antecedents = list(antecedents)
+            self.buffer.append(id)
+            self.buffer.append(len(antecedents))
+            self.buffer.extend(antecedents)
+            if len(self.buffer) >= BUFFER_SIZE:
+                self.flush()
+        else:
+            self.file.write(str(id) + ":" + " ".join(map(str, antecedents)) + "\n")
+
+    def flush(self) -> None:
+        if self.binary:
+            self.file.write(self.buffer.tobytes())
+            del self.buffer[:]
+        self.file.flush()
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self) -> 'AntecedentWriter':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class AntecedentRecorder:
+    """
+    Keeps the antecedents of the proof steps in memory, in place of an
+    `AntecedentWriter` when the trimmed proof is made in the same process.
+    """
+    def __init__(self):
+        self.graph: Dict[int, List[int]] = {}
+
+    def write(self, id: int, antecedents: Iterable[int]) -> None:
+        self.graph[id] = list(antecedents)
+
+    def close(self) -> None:
+        pass
+
+
+def read_antecedents(filename: str) -> Dict[int, List[int]]:
+    """
+    :param: filename: a .rup file in either format
+    :return: the antecedents by step id, the last ones written for a step win.
+    """
+    graph = {}
+    with open(filename, mode="rb") as file:
+        data = file.read()
+    if data.startswith(MAGIC):
+        values = array("I")
+        values.frombytes(data[len(MAGIC):])
+        position = 0
+        while position < len(values):
+            end = position + 2 + values[position + 1]
+            graph[values[position]] = values[position + 2:end].tolist()
+            position = end
+    else:
+        for line in data.decode("utf-8").splitlines():
+            proof_step_id, antecedent = line.split(":")
+            graph[int(proof_step_id)] = [int(x) for x in antecedent.split()]
+    return graph
@@ -0,0 +1,70 @@
+"""
+Assignment Class
+Partial assignment with constant time literal lookups.
+"""
+
+from typing import Iterable, Iterator
+
+
+class Assignment:
+    """
+    Partial assignment stored in a bytearray indexed by literal, negative
+    literals wrapping around from the end, together with the trail of the
+    assigned literals in the order they were assigned.
+    """
+    def __init__(self, no_of_variables: int = 0, literals: Iterable[int] = ()):
+        self.no_of_variables = no_of_variables
+        self.values = bytearray(2 * no_of_variables + 1)
+        self.trail = []
+        for literal in literals:
+            self.assign(literal)
+
+    def grow(self, no_of_variables: int) -> None:
+        """
+        Makes room for the variables up to `no_of_variables`.
+        """
+        old = self.no_of_variables
+        if no_of_variables <= old:
+            return
+        values = bytearray(2 * no_of_variables + 1)
+        values[1:old + 1] = self.values[1:old + 1]
+        if old > 0:
+            values[-old:] = self.values[-old:]
+        self.values = values
+        self.no_of_variables = no_of_variables
+
+    def assign(self, literal: int) -> None:
+        """
+        Sets the literal to true.
+        """
+        if abs(literal) > self.no_of_variables:
+            self.grow(max(abs(literal), 2 * self.no_of_variables))
+        self.values[literal] = 1
+        self.trail.append(literal)
+
+    def backtrack(self, length: int) -> None:
+        """
+        Unassigns the literals on the trail after `length`.
+        """
+        trail = self.trail
+        values = self.values
+        while len(trail) > length:
+            values[trail.pop()] = 0
+
+    def is_unassigned(self, literal: int) -> bool:
+        return literal not in self and -literal not in self
+
+    def __contains__(self, literal: int) -> bool:
+        """
+        :return: True if the literal is assigned true.
+        """
+        return abs(literal) <= self.no_of_variables and self.values[literal] == 1
+
+    def __len__(self) -> int:
+        return len(self.trail)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.trail)
+
+    def __repr__(self) -> str:
+        return "Assignment(" + str(self.trail) + ")"
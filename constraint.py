@@ -3,26 +3,42 @@ Pseudo Boolean Constraint Class
 Implements most PB constraint operations.
 """
 
-from typing import Iterable
-from collections import defaultdict
-import copy
-from math import ceil
+from typing import Dict, Iterable, List
+from array import array
+from assignment import Assignment
+
+
+def coefficient_array(coefficients: Iterable[int]):
+    """
+    :return: the coefficients as an array of 64 bit integers,
+        or a tuple if one of them does not fit.
+    """
+    if not isinstance(coefficients, list):
+        coefficients = list(coefficients)
+    try:
+        return array('q', coefficients)
+    except OverflowError:
+        return tuple(coefficients)
 
 
 class Constraint:
     """
-    Pseudo Boolean Constraint Class 
+    Pseudo Boolean Constraint Class
+    The terms are stored as parallel arrays of literals and coefficients,
+    sorted by variable.
     """
+    __slots__ = ("literal_array", "coefficient_array", "degree", "max_coefficient",
+                 "type", "antecedents", "time_of_death")
+
     def __init__(self, literals, coefficients, degree, type=None, antecedents=None, time_of_death=None):
-        self.literals = set(literals)
-        self.coefficients = defaultdict(int)
-        self.degree = degree  # of falsity
-        self.no_of_literals = len(self.literals)
-        for literal, coefficient in zip(literals, coefficients):
-            self.coefficients[literal] += coefficient
-        if self.no_of_literals != len(self.coefficients):
+        literals = list(literals)
+        coefficients = list(coefficients)
+        if len(literals) != len(coefficients):
             raise ValueError("unequal number of literals and coefficients.")
-        self.coefficient_normalized_form()
+        terms = {}
+        for literal, coefficient in zip(literals, coefficients):
+            terms[literal] = terms.get(literal, 0) + coefficient
+        self.set_terms(terms, degree)
         self.type = None
         self.antecedents = None
         self.time_of_death = -1
@@ -33,140 +49,263 @@ class Constraint:
         if time_of_death is not None:
             self.time_of_death = time_of_death
 
+    @classmethod
+    def from_terms(cls, terms: Dict[int, int], degree: int, type=None) -> 'Constraint':
+        """
+        :return: the constraint over the terms literal -> coefficient,
+            in coefficient normalized form.
+        """
+        constraint = cls.__new__(cls)
+        constraint.set_terms(terms, degree)
+        constraint.type = type
+        constraint.antecedents = None
+        constraint.time_of_death = -1
+        return constraint
+
+    @classmethod
+    def from_lists(cls, literals: List[int], coefficients: List[int], degree: int, type=None) -> 'Constraint':
+        """
+        :return: the constraint over the parallel lists of literals and
+            coefficients, in coefficient normalized form.
+        """
+        variables = list(map(abs, literals))
+        # only lines with repeated variables or zero coefficients go through a dict
+        if len(set(variables)) != len(variables) or min(coefficients, default=1) <= 0 and 0 in coefficients:
+            terms = {}
+            for literal, coefficient in zip(literals, coefficients):
+                terms[literal] = terms.get(literal, 0) + coefficient
+            return cls.from_terms(terms, degree, type)
+        smallest = min(coefficients, default=0)
+        largest = max(coefficients, default=0)
+        if smallest < 0:
+            degree -= sum([i for i in coefficients if i < 0])
+            literals = [-literal if coefficient < 0 else literal
+                        for literal, coefficient in zip(literals, coefficients)]
+            coefficients = list(map(abs, coefficients))
+            smallest = min(coefficients)
+            largest = max(coefficients)
+        constraint = cls.__new__(cls)
+        if sorted(variables) == variables:
+            # OPB files mostly list the variables in the order they were first seen
+            constraint.literal_array = array('q', literals)
+        elif smallest == largest:
+            # all coefficients are the same, only the literals need sorting
+            constraint.literal_array = array('q', sorted(literals, key=abs))
+        else:
+            order = sorted(range(len(variables)), key=variables.__getitem__)
+            coefficients = list(map(coefficients.__getitem__, order))
+            constraint.literal_array = array('q', map(literals.__getitem__, order))
+        try:
+            constraint.coefficient_array = array('q', coefficients)
+        except OverflowError:
+            constraint.coefficient_array = tuple(coefficients)
+        constraint.degree = degree
+        constraint.max_coefficient = largest
+        constraint.type = type
+        constraint.antecedents = None
+        constraint.time_of_death = -1
+        return constraint
+
+    @classmethod
+    def from_arrays(cls, literal_array: array, coefficient_array: array, degree: int, type=None) -> 'Constraint':
+        """
+        :return: the constraint over arrays that are already in coefficient
+            normalized form and sorted by variable, which it takes over.
+        """
+        constraint = cls.__new__(cls)
+        constraint.literal_array = literal_array
+        constraint.coefficient_array = coefficient_array
+        constraint.degree = degree
+        constraint.max_coefficient = max(coefficient_array, default=0)
+        constraint.type = type
+        constraint.antecedents = None
+        constraint.time_of_death = -1
+        return constraint
+
+    def set_terms(self, terms: Dict[int, int], degree: int, normalize=True) -> None:
+        """
+        Replaces the terms and the degree of the constraint,
+        in coefficient normalized form unless `normalize` is False.
+        """
+        if normalize and min(terms.values(), default=1) <= 0:
+            normalized = {}
+            for literal, coefficient in terms.items():
+                if coefficient < 0:
+                    degree -= coefficient
+                    literal, coefficient = -literal, -coefficient
+                if coefficient != 0:
+                    normalized[literal] = normalized.get(literal, 0) + coefficient
+            terms = normalized
+        literals = sorted(terms, key=abs)
+        self.literal_array = array('q', literals)
+        self.coefficient_array = coefficient_array([terms[i] for i in literals])
+        self.degree = degree  # of falsity
+        self.max_coefficient = max(self.coefficient_array, default=0)
+
+    @property
+    def literals(self) -> frozenset:
+        return frozenset(self.literal_array)
+
+    @property
+    def coefficients(self) -> Dict[int, int]:
+        return dict(zip(self.literal_array, self.coefficient_array))
+
+    @property
+    def no_of_literals(self) -> int:
+        return len(self.literal_array)
+
+    def copy(self) -> 'Constraint':
+        """
+        :return: a copy of the constraint, sharing its (never mutated) arrays.
+        """
+        new_constraint = Constraint.__new__(Constraint)
+        new_constraint.literal_array = self.literal_array
+        new_constraint.coefficient_array = self.coefficient_array
+        new_constraint.degree = self.degree
+        new_constraint.max_coefficient = self.max_coefficient
+        new_constraint.type = self.type
+        new_constraint.antecedents = None if self.antecedents is None else list(self.antecedents)
+        new_constraint.time_of_death = self.time_of_death
+        return new_constraint
+
+    def __copy__(self) -> 'Constraint':
+        return self.copy()
+
+    def __deepcopy__(self, memo) -> 'Constraint':
+        return self.copy()
+
     def is_unsatisfied(self, assignment: Iterable) -> bool:
         """
         :param: assignment: the assignment
         :return: True if the constraint is satisfied in the `assignment`,
             i.e. one of its literals is True.
         """
-        # print(self.slack(assignment), self, sorted(assignment, key=lambda x: abs(x)))
         return self.slack(assignment) < 0
 
     def flip_literal(self, literal):
         """
         Changes the sign of the literal in the constraint.
         """
-        coefficient = self.coefficients[literal]
-        self.degree -= coefficient
-        self.coefficients[-literal] += -coefficient
-        del self.coefficients[literal]
-        self.literals.add(-literal)
-        self.literals.remove(literal)
+        terms = self.coefficients
+        coefficient = terms.pop(literal)
+        terms[-literal] = terms.get(-literal, 0) - coefficient
+        self.set_terms(terms, self.degree - coefficient, normalize=False)
 
     def delete_literal(self, literal):
         """
         Deletes the literal and/or the negative
         of the literal from the constraint.
         """
-        literals = self.literals
-        if literal in literals:
-            self.literals.remove(literal)
-            del self.coefficients[literal]
-        if -literal in literals:
-            self.literals.remove(-literal)
-            del self.coefficients[-literal]
+        terms = self.coefficients
+        terms.pop(literal, None)
+        terms.pop(-literal, None)
+        self.set_terms(terms, self.degree, normalize=False)
 
     def literal_normalized_form(self):
         """
         Normalizes the constraint in literal normalized form.
         """
-        literals = list(self.literals)
-        for i in literals:
-            if i < 0:
-                self.flip_literal(i)
-            if i in self.coefficients and self.coefficients[i] == 0:
-                self.delete_literal(i)
+        terms = {}
+        degree = self.degree
+        for literal, coefficient in zip(self.literal_array, self.coefficient_array):
+            if literal < 0:
+                degree -= coefficient
+                literal, coefficient = -literal, -coefficient
+            terms[literal] = terms.get(literal, 0) + coefficient
+        self.set_terms({i: c for i, c in terms.items() if c != 0}, degree, normalize=False)
 
     def coefficient_normalized_form(self):
         """
-        Normalizes the constraint in coefficient normalized form.
+        Normalizes the constraint in coefficient normalized form
+        and caches its largest coefficient.
         """
-        literals = list(self.literals)
-        for i in literals:
-            coefficient = self.coefficients[i]
-            if coefficient < 0:
-                self.flip_literal(i)
-            if i in self.coefficients and self.coefficients[i] == 0:
-                self.delete_literal(i)
+        if min(self.coefficient_array, default=1) > 0:
+            return
+        self.set_terms(self.coefficients, self.degree)
 
     def slack(self, assignment: Iterable) -> int:
         """
-        :param: assignment: the assignment
+        :param: assignment: the assignment, an `Assignment` or
+            any container of the true literals
         :return: the slack of the constraint in the `assignment`,
             i.e. the number of literals not falsified by an
             assignment minus the degree.
         """
-        temp = 0
-        for i in self.literals:
-            if -i not in assignment:
-                temp += self.coefficients[i]
-        temp -= self.degree
+        temp = -self.degree
+        if isinstance(assignment, Assignment):
+            values = assignment.values
+            for i, coefficient in zip(self.literal_array, self.coefficient_array):
+                if not values[-i]:
+                    temp += coefficient
+        else:
+            for i, coefficient in zip(self.literal_array, self.coefficient_array):
+                if -i not in assignment:
+                    temp += coefficient
         return temp
 
     def propagate(self, assignment: Iterable) -> Iterable:
         """
-        :param: assignment: the assignment
+        :param: assignment: the assignment, an `Assignment` or
+            any container of the true literals
         :return: the literals that need be added
             to the assignment to satisfy the constraint.
         """
 
         need_to_be_true = []
         slack = self.slack(assignment)
-        for i in self.literals:
+        if slack >= self.max_coefficient:
+            return need_to_be_true
+        if isinstance(assignment, Assignment):
+            values = assignment.values
+            for i, coefficient in zip(self.literal_array, self.coefficient_array):
+                if not (values[-i] or values[i]):
+                    if slack < coefficient:
+                        need_to_be_true.append(i)
+            return need_to_be_true
+        for i, coefficient in zip(self.literal_array, self.coefficient_array):
             # if any assignment is falsified, skip it.
             if not (-i in assignment or i in assignment):
-                if slack < self.coefficients[i]:
+                if slack < coefficient:
                     need_to_be_true.append(i)
         return need_to_be_true
 
+    def implies(self, other: 'Constraint') -> bool:
+        """
+        :param: other: the other constraint
+        :return: whether the other constraint follows from this one by
+            weakening, the check of j steps.
+        """
+        coefficients = other.coefficients
+        degree = self.degree
+        for i, coefficient in zip(self.literal_array, self.coefficient_array):
+            surplus = coefficient - coefficients.get(i, 0)
+            if surplus > 0:
+                degree -= surplus
+        return degree >= other.degree
+
     def negation(self):
         """
         Negates the constraint
         """
-        for i in self.literals:
-            self.coefficients[i] = - self.coefficients[i]
-        self.degree = -self.degree + 1
-        self.coefficient_normalized_form()
-
+        self.set_terms({i: -coefficient for i, coefficient in zip(self.literal_array, self.coefficient_array)},
+                       -self.degree + 1)
 
     def __add__(self, other: 'Constraint'):
-        self.literal_normalized_form()
-        other.literal_normalized_form()
-        degree = self.degree + other.degree
-        literals = set(self.literals) | set(other.literals)
-        literal_coefficient_pair = {i: self.coefficients.get(
-            i, 0) + other.coefficients.get(i, 0) for i in literals}
-        [*literals], [*coefficients] = zip(*literal_coefficient_pair.items())
-        self.coefficient_normalized_form()
-        other.coefficient_normalized_form()
-        new_constraint = Constraint(literals, coefficients, degree)
-        new_constraint.coefficient_normalized_form()
-        return new_constraint
+        return LinearCombination(self).add(other).to_constraint()
 
     def __mul__(self, other: int):
-        new_constraint = copy.deepcopy(self)
-        for i in new_constraint.literals:
-            new_constraint.coefficients[i] *= other
-        new_constraint.degree *= other
-        new_constraint.coefficient_normalized_form()
+        new_constraint = self.copy()
+        new_constraint.set_terms({i: coefficient * other for i, coefficient in
+                                  zip(self.literal_array, self.coefficient_array)}, self.degree * other)
         return new_constraint
 
     def __sub__(self, other: 'Constraint'):
-        diff = copy.deepcopy(other)
-        diff = diff * -1
-        diff = self + diff
-        diff.coefficient_normalized_form()
-        return diff
+        return self + other * -1
 
     def __truediv__(self, other: int):
-        div = copy.deepcopy(self)
         if type(other) != int:
             raise TypeError("other must be an integer")
-        for i in div.literals:
-            div.coefficients[i] = int(ceil(div.coefficients[i] / other))
-        div.degree = int(ceil(div.degree / other))
-        div.coefficient_normalized_form()
-        return div
+        return LinearCombination(self).divide(other).to_constraint()
 
     def __eq__(self, other: 'Constraint') -> bool:
         """
@@ -176,24 +315,18 @@ class Constraint:
         other.coefficient_normalized_form()
         if self.degree != other.degree:
             return False
-        if sorted(self.literals) != sorted(other.literals):
-            return False
-        for i in self.literals:
-            if self.coefficients[i] != other.coefficients[i]:
-                return False
-        return True
+        return self.coefficients == other.coefficients
 
     def __str__(self) -> str:
         """
         :return: the string representation of the constraint.
         """
         temp = ""
-        abs_sorted_lits = sorted(list(self.literals), key=abs)
-        for i in abs_sorted_lits:
+        for i, coefficient in zip(self.literal_array, self.coefficient_array):
             if i > 0:
-                temp += str(self.coefficients[i]) + " x" + str(i) + " "
+                temp += str(coefficient) + " x" + str(i) + " "
             else:
-                temp += str(self.coefficients[i]) + " ~x" + str(-i) + " "
+                temp += str(coefficient) + " ~x" + str(-i) + " "
         temp = temp[:-1] + " >= " + str(self.degree)
         return temp
 
@@ -201,15 +334,114 @@ class Constraint:
         """
         :return: the string representation of the constraint.
         """
-        temp = ""
-        abs_sorted_lits = sorted(list(self.literals), key=abs)
-        for i in abs_sorted_lits:
-            if i > 0:
-                temp += str(self.coefficients[i]) + " x" + str(i) + " "
+        return self.__str__()
+
+
+class LinearCombination:
+    """
+    Mutable sum of scaled constraints, kept as variable -> coefficient
+    (negative for the negated literal) and a degree, so that a whole pol
+    line is evaluated in place and only the result becomes a Constraint.
+    """
+    __slots__ = ("terms", "degree")
+
+    def __init__(self, constraint: Constraint = None):
+        self.terms: Dict[int, int] = {}
+        self.degree = 0
+        if constraint is not None:
+            self.add(constraint)
+
+    def add(self, constraint: Constraint, multiplier: int = 1) -> 'LinearCombination':
+        """
+        Adds `multiplier` times the constraint.
+        """
+        terms = self.terms
+        degree = self.degree + multiplier * constraint.degree
+        for literal, coefficient in zip(constraint.literal_array, constraint.coefficient_array):
+            coefficient *= multiplier
+            if literal < 0:
+                degree -= coefficient
+                literal, coefficient = -literal, -coefficient
+            terms[literal] = terms.get(literal, 0) + coefficient
+        self.degree = degree
+        return self
+
+    def add_combination(self, other: 'LinearCombination', multiplier: int = 1) -> 'LinearCombination':
+        """
+        Adds `multiplier` times the other linear combination.
+        """
+        terms = self.terms
+        for variable, coefficient in other.terms.items():
+            terms[variable] = terms.get(variable, 0) + multiplier * coefficient
+        self.degree += multiplier * other.degree
+        return self
+
+    def add_literal(self, literal: int, multiplier: int = 1) -> 'LinearCombination':
+        """
+        Adds `multiplier` times the literal axiom `literal >= 0`.
+        """
+        if literal < 0:
+            self.degree -= multiplier
+            self.terms[-literal] = self.terms.get(-literal, 0) - multiplier
+        else:
+            self.terms[literal] = self.terms.get(literal, 0) + multiplier
+        return self
+
+    def multiply(self, factor: int) -> 'LinearCombination':
+        terms = self.terms
+        for variable in terms:
+            terms[variable] *= factor
+        self.degree *= factor
+        return self
+
+    def divide(self, divisor: int) -> 'LinearCombination':
+        """
+        Divides the coefficient normalized form by `divisor`, rounding up.
+        """
+        if divisor <= 0:
+            raise ValueError("divisor must be positive")
+        terms = self.terms
+        degree = self.degree
+        # degree of the coefficient normalized form
+        for coefficient in terms.values():
+            if coefficient < 0:
+                degree -= coefficient
+        degree = -(-degree // divisor)
+        for variable, coefficient in terms.items():
+            if coefficient < 0:
+                coefficient = -(coefficient // divisor)
+                degree -= coefficient
+                terms[variable] = -coefficient
             else:
-                temp += str(self.coefficients[i]) + " ~x" + str(-i) + " "
-        temp = temp[:-1] + " >= " + str(self.degree)
-        return temp
+                terms[variable] = -(-coefficient // divisor)
+        self.degree = degree
+        return self
+
+    def saturate(self) -> 'LinearCombination':
+        """
+        Caps the coefficients of the coefficient normalized form at its degree.
+        """
+        terms = self.terms
+        degree = self.degree
+        for coefficient in terms.values():
+            if coefficient < 0:
+                degree -= coefficient
+        if degree <= 0:
+            return self
+        for variable, coefficient in terms.items():
+            if coefficient > degree:
+                terms[variable] = degree
+            elif coefficient < -degree:
+                # the negated literal is capped, moving the difference to the degree
+                self.degree += -degree - coefficient
+                terms[variable] = -degree
+        return self
+
+    def to_constraint(self) -> Constraint:
+        """
+        :return: the linear combination as a coefficient normalized Constraint.
+        """
+        return Constraint.from_terms(self.terms, self.degree)
 
 
 # if "__main__" == __name__:
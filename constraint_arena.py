@@ -0,0 +1,323 @@
+"""
+Constraint Arena
+Append-only columnar store of the constraint database, indexed directly by
+constraint id. It can be saved to a file and memory-mapped back read-only,
+or spill its terms to disk to keep the constraints in memory under a cap.
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+from array import array
+from collections import deque
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+from constraint import Constraint
+
+MAGIC = b"SMOLARN1"
+# magic, rows (including the unused id 0), terms, antecedents
+HEADER = struct.Struct("=8s3q")
+# row flags
+ALIVE = 1
+STORED = 2  # the row holds its constraint rather than a stand in
+WIDE = 4  # a coefficient or the degree does not fit in 64 bits, the row is kept as an object or pickled
+RESIDENT = 8  # the constraint of the row is in `objects` and counts towards the memory cap
+# rough size in bytes of a constraint object besides its terms
+OBJECT_OVERHEAD = 200
+
+
+class ConstraintArena:
+    """
+    One row per constraint id, id 0 is unused. `objects` holds the
+    Constraint (or whatever stands in for it until it is stored) of every
+    row, None once it is deleted. Without a memory cap it is the only copy
+    of the terms, the columns only get them in the file written by `save`:
+    the terms of row i are then `literals[starts[i]:ends[i]]` and
+    `coefficients[starts[i]:ends[i]]`.
+
+    With a `memory_cap` (in bytes) the terms are appended to a temporary
+    spill file in the order they were stored, so rows admitted lazily can
+    be filled in later, and constraints are
+    dropped from `objects` oldest first once their estimated size goes
+    over the cap, or right away with `evict`. `constraint` reads them back
+    from the file. Wide rows are pickled to a spill file of their own.
+    """
+    def __init__(self, memory_cap: int = None):
+        self.objects: List[Optional[object]] = [None]
+        self.starts = array("q", [0])
+        self.ends = array("q", [0])
+        # the terms of the rows, only filled in when the arena is opened from a file
+        self.literals = None
+        self.coefficients = None
+        self.degrees = array("q", [0])
+        self.types = bytearray(1)
+        self.antecedent_starts = array("q", [0])
+        self.antecedent_ends = array("q", [0])
+        self.antecedents = array("q")
+        self.flags = bytearray(1)
+        self.no_of_terms = 0
+        self.file = None
+        self.data = None
+        self.memory_cap = memory_cap
+        self.resident = deque()
+        self.resident_bytes = 0
+        self.spill = None
+        self.wide_spill = None
+        # id -> offset and length of the pickled terms of a wide row
+        self.wide_rows: Dict[int, Tuple[int, int]] = {}
+        if memory_cap is not None:
+            # rows are laid out one after the other, literals then coefficients
+            self.spill = tempfile.TemporaryFile()
+
+    def __len__(self) -> int:
+        """
+        :return: the number of rows, deleted ones included.
+        """
+        return len(self.flags) - 1
+
+    def add(self, item, type: str = None, antecedents: List[int] = None) -> int:
+        """
+        :param: item: the constraint, or a stand in for it that is stored later with `store`
+        :param: type, antecedents: the step type and antecedents of the row,
+            taken from the constraint if not given
+        :return: the id of the new row.
+        """
+        id = len(self.flags)
+        if type is None:
+            type = getattr(item, "type", None)
+        if antecedents is None:
+            antecedents = getattr(item, "antecedents", None) or ()
+        self.objects.append(item)
+        self.starts.append(0)
+        self.ends.append(0)
+        self.degrees.append(0)
+        self.types.append(ord(type) if type else 0)
+        self.antecedent_starts.append(len(self.antecedents))
+        self.antecedents.extend(antecedents)
+        self.antecedent_ends.append(len(self.antecedents))
+        self.flags.append(ALIVE)
+        if hasattr(item, "literal_array"):
+            self.store(id, item)
+        return id
+
+    def store(self, id: int, constraint: Constraint) -> None:
+        """
+        Makes the constraint the object of row `id`. Under a memory cap its
+        terms are also appended to the spill file, without one the object
+        is the only copy of them until the arena is saved.
+        """
+        self.objects[id] = constraint
+        if not isinstance(constraint.coefficient_array, array) or not -2 ** 63 <= constraint.degree < 2 ** 63:
+            self.flags[id] |= STORED | WIDE
+            if self.spill is not None:
+                if self.wide_spill is None:
+                    self.wide_spill = tempfile.TemporaryFile()
+                data = pickle.dumps((constraint.literal_array, constraint.coefficient_array, constraint.degree))
+                self.wide_rows[id] = (self.wide_spill.tell(), len(data))
+                self.wide_spill.write(data)
+                self.make_resident(id)
+            return
+        self.flags[id] |= STORED
+        if self.spill is not None:
+            self.starts[id] = self.no_of_terms
+            self.no_of_terms += len(constraint.literal_array)
+            self.ends[id] = self.no_of_terms
+            self.degrees[id] = constraint.degree
+            self.spill.write(constraint.literal_array.tobytes())
+            self.spill.write(constraint.coefficient_array.tobytes())
+            self.make_resident(id)
+
+    def make_resident(self, id: int) -> None:
+        """
+        Counts the constraint of row `id` towards the cap, dropping the oldest ones over it.
+        """
+        self.flags[id] |= RESIDENT
+        self.resident.append(id)
+        self.resident_bytes += self.row_bytes(id)
+        while self.resident_bytes > self.memory_cap and len(self.resident) > 1:
+            self.evict(self.resident.popleft())
+
+    def evict(self, id: int) -> None:
+        """
+        Drops the constraint of row `id` from memory if it can be read back from the spill file.
+        """
+        if self.flags[id] & RESIDENT:
+            self.release(id)
+            self.objects[id] = None
+
+    def release(self, id: int) -> None:
+        """
+        Stops counting the constraint of row `id` towards the cap.
+        """
+        if self.flags[id] & RESIDENT:
+            self.flags[id] &= ~RESIDENT
+            self.resident_bytes -= self.row_bytes(id)
+
+    def row_bytes(self, id: int) -> int:
+        """
+        :return: the estimated size of the constraint of row `id` in memory.
+        """
+        if self.flags[id] & WIDE:
+            return OBJECT_OVERHEAD + self.wide_rows[id][1]
+        return OBJECT_OVERHEAD + 16 * (self.ends[id] - self.starts[id])
+
+    def delete(self, id: int) -> Optional[object]:
+        """
+        Drops the object of the row, its columns stay as they are.
+        :return: the object, None if the row was already deleted.
+        """
+        item = self.objects[id]
+        self.objects[id] = None
+        self.release(id)
+        self.flags[id] &= ~ALIVE
+        return item
+
+    def is_alive(self, id: int) -> bool:
+        return 0 < id < len(self.flags) and self.flags[id] & ALIVE != 0
+
+    def live_ids(self) -> Iterator[int]:
+        """
+        Yields the ids of the rows not deleted, in order.
+        """
+        flags = self.flags
+        for id in range(1, len(flags)):
+            if flags[id] & ALIVE:
+                yield id
+
+    def type(self, id: int) -> Optional[str]:
+        return chr(self.types[id]) if self.types[id] else None
+
+    def antecedents_of(self, id: int) -> List[int]:
+        return list(self.antecedents[self.antecedent_starts[id]:self.antecedent_ends[id]])
+
+    def terms(self, id: int) -> Tuple[array, array]:
+        """
+        :return: new arrays of the literals and coefficients of row `id`.
+        """
+        if self.spill is None and self.literals is None:
+            constraint = self.objects[id]
+            return array("q", constraint.literal_array), array("q", constraint.coefficient_array)
+        start, end = self.starts[id], self.ends[id]
+        if self.spill is None:
+            return array("q", self.literals[start:end]), array("q", self.coefficients[start:end])
+        if self.data is None or len(self.data) < 16 * end:
+            # the map is only renewed once the file has grown past it
+            self.spill.flush()
+            if self.data is not None:
+                self.data.close()
+            self.data = mmap.mmap(self.spill.fileno(), 0, access=mmap.ACCESS_READ)
+        middle = 16 * start + 8 * (end - start)
+        literals = array("q")
+        literals.frombytes(self.data[16 * start:middle])
+        coefficients = array("q")
+        coefficients.frombytes(self.data[middle:16 * end])
+        return literals, coefficients
+
+    def constraint(self, id: int) -> Constraint:
+        """
+        :return: the constraint of row `id`, built from the columns if it was
+            dropped for the memory cap or the arena was opened from a file.
+        :raises KeyError: if the row is deleted or its constraint cannot be built.
+        """
+        item = self.objects[id] if 0 <= id < len(self.objects) else None
+        if item is not None:
+            return item
+        flags = self.flags[id] if 0 < id < len(self.flags) else 0
+        if flags & (ALIVE | STORED) != ALIVE | STORED:
+            raise KeyError(id)
+        if flags & WIDE:
+            if id not in self.wide_rows:
+                raise KeyError(id)
+            offset, length = self.wide_rows[id]
+            self.wide_spill.flush()
+            constraint = Constraint.from_arrays(*pickle.loads(os.pread(self.wide_spill.fileno(), length, offset)),
+                                                self.type(id))
+        else:
+            constraint = Constraint.from_arrays(*self.terms(id), self.degrees[id], self.type(id))
+        constraint.antecedents = self.antecedents_of(id) or None
+        if self.spill is not None:
+            self.objects[id] = constraint
+            self.make_resident(id)
+        return constraint
+
+    def save(self, filename: str) -> None:
+        """
+        Writes the columns in native byte order, with the terms of the rows
+        one after the other in id order. Rows that are not stored, too wide
+        or deleted without a memory cap are saved empty.
+        """
+        rows = len(self.flags)
+        flags = bytearray(flag & ~RESIDENT for flag in self.flags)
+        starts, ends, degrees = array("q", bytes(8 * rows)), array("q", bytes(8 * rows)), array("q", bytes(8 * rows))
+        saved = []
+        no_of_terms = 0
+        for id in range(1, rows):
+            if flags[id] & WIDE or self.spill is None and self.objects[id] is None:
+                flags[id] &= ~STORED
+            if not flags[id] & STORED:
+                continue
+            if self.spill is None:
+                length, degrees[id] = len(self.objects[id].literal_array), self.objects[id].degree
+            else:
+                length, degrees[id] = self.ends[id] - self.starts[id], self.degrees[id]
+            starts[id] = no_of_terms
+            no_of_terms += length
+            ends[id] = no_of_terms
+            saved.append(id)
+        with open(filename, mode="wb") as file:
+            file.write(HEADER.pack(MAGIC, rows, no_of_terms, len(self.antecedents)))
+            for column in (starts, ends, degrees, self.antecedent_starts, self.antecedent_ends):
+                file.write(column.tobytes())
+            for column in range(2):
+                for id in saved:
+                    file.write(self.terms(id)[column].tobytes())
+            file.write(self.antecedents.tobytes())
+            file.write(self.types)
+            file.write(flags)
+
+    @classmethod
+    def open(cls, filename: str) -> 'ConstraintArena':
+        """
+        :return: a read-only arena over the memory-mapped file written by `save`,
+            its columns are shared with every other process mapping the file.
+        :raises ValueError: if the file is not a complete arena.
+        """
+        arena = cls()
+        arena.file = open(filename, mode="rb")
+        arena.data = mmap.mmap(arena.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(arena.data) < HEADER.size:
+            arena.close()
+            raise ValueError("Truncated constraint arena: " + filename)
+        magic, rows, terms, antecedents = HEADER.unpack_from(arena.data)
+        if magic != MAGIC or len(arena.data) != HEADER.size + 8 * (5 * rows + 2 * terms + antecedents) + 2 * rows:
+            arena.close()
+            raise ValueError("Not a constraint arena: " + filename)
+        view = memoryview(arena.data)
+        offset = HEADER.size
+        columns = []
+        for length in (rows, rows, rows, rows, rows, terms, terms, antecedents):
+            columns.append(view[offset:offset + 8 * length].cast("q"))
+            offset += 8 * length
+        (arena.starts, arena.ends, arena.degrees, arena.antecedent_starts,
+         arena.antecedent_ends, arena.literals, arena.coefficients, arena.antecedents) = columns
+        arena.types = bytes(view[offset:offset + rows])
+        arena.flags = bytes(view[offset + rows:offset + 2 * rows])
+        arena.objects = [None] * rows
+        arena.no_of_terms = terms
+        return arena
+
+    def close(self) -> None:
+        if self.data is not None:
+            # the views of the columns have to go before the map can be closed
+            if self.spill is None:
+                self.starts = self.ends = self.degrees = self.antecedent_starts = None
+                self.antecedent_ends = self.literals = self.coefficients = self.antecedents = None
+            self.data.close()
+            self.data = None
+        if self.file is not None:
+            self.file.close()
+        if self.spill is not None:
+            self.spill.close()
+        if self.wide_spill is not None:
+            self.wide_spill.close()
@@ -1,7 +1,12 @@
 from constraint import Constraint
-from typing import Iterable, Dict
-import copy
-import logging
+from assignment import Assignment
+from propagator import Propagator
+from pol import compile_pol, evaluate_pol
+from slack_matrix import SlackMatrix
+from opb_parser import parse_constraint, parse_opb
+from constraint_arena import ConstraintArena
+from antecedent_writer import AntecedentWriter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 
 class Model:
@@ -9,16 +14,26 @@ class Model:
     The class for the model.
     """
 
-    def __init__(self, filename, loud=False):
+    def __init__(self, filename, loud=False, memory_cap=None, binary_rup=False, rup_writer=None,
+                 hints: Dict[int, List[int]] = None):
+        """
+        memory_cap: if given, the bytes of constraints and of the occurrence
+        index of the propagator kept in memory, half the cap each. The rest of
+        the constraints are spilled to disk and read back when needed, the rest
+        of the index is suspended
+        binary_rup: whether to write the antecedents in the binary format of `AntecedentWriter`
+        rup_writer: where to write the antecedents instead of the .rup file,
+        e.g. an `AntecedentRecorder` to keep them in memory
+        hints: the antecedents by step id, RUP steps with hints are first
+        checked by propagating over the hinted constraints only
+        """
         name = filename.split('/')[-1].split('.')[0]
         self.loud = loud
-        self.logger = logging.getLogger('model_logging')
-        f_handler = logging.FileHandler('rup/'+name+'.rup', mode='w')
-        f_handler.setLevel(logging.WARNING)
-        self.logger.addHandler(f_handler)
+        if rup_writer is None:
+            rup_writer = AntecedentWriter('rup/'+name+'.rup', binary=binary_rup)
+        self.rup_writer = rup_writer
+        self.hints = hints or {}
         self.filename = filename
-        self.model_constraint_db: Dict[int, Constraint] = {}
-        self.proof_constraint_db: Dict[int, Constraint] = {}
         self.expected_no_of_literals = 0
         self.expected_no_of_constraints = 0
         self.literal_id_map = {}
@@ -26,29 +41,38 @@ class Model:
         self.no_of_constraints = 0
         self.no_of_model_constraints = 0
         self.constraints_known_to_propagate = set()
-        self.dead_constraints = set()
+        budget = memory_cap // 2 if memory_cap is not None else None
+        self.propagator = Propagator(self.get_constraint, budget)
+        # model and proof constraints, indexed by id
+        self.arena = ConstraintArena(budget)
         self.parse()
 
     def get_constraint(self, id) -> Constraint:
         """
         id: the id of the constraint to be returned
         """
-        # print(id)
-        if id <= self.no_of_model_constraints:
-            return self.model_constraint_db[id]
-        else:
-            return self.proof_constraint_db[id]
+        constraint = self.arena.objects[id]
+        if constraint is None:
+            # deleted, or spilled to disk under a memory cap
+            return self.arena.constraint(id)
+        return constraint
 
     def delete_constraint(self, id: int) -> None:
         """
-        id: the id of the constraint to be deleted
+        id: the id of the constraint to be deleted, nothing
+        happens if it has already been deleted
         """
-        if id <= self.no_of_model_constraints:
-            raise ValueError("Cannot delete a constraint from the proof")
-            # del self.model_constraint_db[id]
-        else:
-            del self.proof_constraint_db[id]
-        self.dead_constraints.add(id)
+        if not self.arena.is_alive(id):
+            return
+        self.propagator.unwatch(id, self.get_constraint(id))
+        self.arena.delete(id)
+        self.constraints_known_to_propagate.discard(id)
+
+    def live_constraints(self) -> Iterable[int]:
+        """
+        :return: the ids of the constraints that have not been deleted, in order.
+        """
+        return self.arena.live_ids()
 
     def add_constraint(self, constraint: Constraint, to_model=False) -> None:
         """
@@ -57,11 +81,8 @@ class Model:
         Adds the constraint to the model and updates
         the number of constraints
         """
-        self.no_of_constraints += 1
-        if to_model:
-            self.model_constraint_db[self.no_of_constraints] = constraint
-        else:
-            self.proof_constraint_db[self.no_of_constraints] = constraint
+        self.no_of_constraints = self.arena.add(constraint)
+        self.propagator.watch(self.no_of_constraints, constraint)
         if self.loud:
             print("    ConstraintId " +"{:03d}".format(self.no_of_constraints) + ":", self.constraint_str(constraint))
 
@@ -70,40 +91,19 @@ class Model:
         :param: line: the line to be parsed
         :return: the constraint object
         """
-        line = line.strip()
-        line = line[:-1].split(">=")
-        degree = int(line[1])
-        line = line[0].split()
-        coefficients = [int(line[i]) for i in range(0, len(line), 2)]
-        literals = [line[i] for i in range(1, len(line), 2)]
-        literal_ids = []
-        for i in literals:
-            temp = i if i[0] != "~" else i[1:]
-            if temp not in self.literal_id_map:
-                self.no_of_literals += 1
-                self.literal_id_map[temp] = self.no_of_literals
-            literal_ids.append(
-                self.literal_id_map[temp] if i[0] != "~" else -1*self.literal_id_map[temp])
-        if len(coefficients) != len(literal_ids):
-            raise Exception(
-                "unequal number of literals and coefficients")
-        temp = Constraint(literal_ids, coefficients, degree)
-        return temp
+        constraint = parse_constraint(line, self.literal_id_map)
+        self.no_of_literals = len(self.literal_id_map)
+        return constraint
 
     def parse(self) -> None:
         """
         Parses the model file and adds the constraints to the model
         """
-        with open(self.filename, mode="r", encoding="utf-8") as file:
-            for line in file:
-                line = line.strip()
-                if "#variable=" in line:
-                    temp = line.split()
-                    self.expected_no_of_literals = int(temp[2])
-                    self.expected_no_of_constraints = int(temp[4])
-                if not line.startswith("*") and len(line) > 0:
-                    temp = self.constraint_parser(line)
-                    self.add_constraint(temp, True)
+        self.expected_no_of_literals, self.expected_no_of_constraints, constraints = \
+            parse_opb(self.filename, self.literal_id_map)
+        self.no_of_literals = len(self.literal_id_map)
+        for constraint in constraints:
+            self.add_constraint(constraint, True)
         self.no_of_model_constraints = self.no_of_constraints
         # if self.expected_no_of_literals != self.no_of_literals:
         #     print("WARNING: NUMBER OF LITERALS IN MODEL FILE HEADER DOES NOT MATCH WITH THE NUMBER OF LITERALS IN THE FILE")
@@ -136,31 +136,26 @@ class Model:
             raise Exception("INVALID SOLUTION CLAIMED")
 
     def is_solution(self, constraint: Constraint):
-        tau = constraint.propagate([])
+        tau = Assignment(self.no_of_literals, constraint.propagate([]))
         if self.loud:
             print("    ASSIGNMENT: ", tau)
         fired_constraints = []
+        if len(tau) == self.no_of_literals:
+            return self.is_total_solution(tau)
+        # the constraints known to propagate are tried first
+        order = list(self.constraints_known_to_propagate)
+        order += [i for i in self.live_constraints() if i not in self.constraints_known_to_propagate]
+        matrix = SlackMatrix(order, self.get_constraint)
         while True:
             unit_propagated = False
-            for i in self.constraints_known_to_propagate:
-                if i not in self.dead_constraints:
-                    constraint = self.get_constraint(i)
-                    constraint_propagates = constraint.propagate(tau)
-                    if constraint_propagates != []:
-                        fired_constraints.append(i)
-                        tau += constraint_propagates
-                        unit_propagated = True
-                        break
-            if not unit_propagated:
-                for i in range(1, self.no_of_constraints+1):
-                    if i not in self.constraints_known_to_propagate and i not in self.dead_constraints:
-                        constraint = self.get_constraint(i)
-                        constraint_propagates = constraint.propagate(tau)
-                        if constraint_propagates != []:
-                            fired_constraints.append(i)
-                            tau += constraint_propagates
-                            unit_propagated = True
-                            break
+            for row in matrix.candidates(tau):
+                constraint_propagates = matrix.constraints[row].propagate(tau)
+                if constraint_propagates != []:
+                    fired_constraints.append(matrix.ids[row])
+                    for literal in constraint_propagates:
+                        tau.assign(literal)
+                    unit_propagated = True
+                    break
             if not unit_propagated:
                 if len(tau) != self.no_of_literals:
                     raise Exception(
@@ -168,120 +163,32 @@ class Model:
                 else:
                     if self.loud:
                         print("    VALID SOLUTION FOUND")
-                    self.logger.warning(str(self.no_of_constraints+1)+":"+" ".join([str(i) for i in fired_constraints]))
+                    self.rup_writer.write(self.no_of_constraints+1, fired_constraints)
                     return True
 
+    def is_total_solution(self, tau: Assignment) -> bool:
+        """
+        Checks a total assignment in one pass over the constraints,
+        nothing can propagate so no antecedents are needed.
+        """
+        if not SlackMatrix(self.live_constraints(), self.get_constraint).is_satisfied(tau):
+            raise Exception("INVALID SOLUTION CLAIMED, CONSTRAINT FALSIFIED")
+        if self.loud:
+            print("    VALID SOLUTION FOUND")
+        self.rup_writer.write(self.no_of_constraints+1, [])
+        return True
+
     def admit_pol_step(self, statement: str) -> None:
         """
         Processes the polish notation statement on the constraints
         and adds the new constraint to the model
         """
-        statement = statement.strip().split(" ")[1:-1]
-        antecedents = []
-        stack = []
-        operations = ["+", "-", "*", "d"]
-        if len(statement) == 1:
-            id = int(statement[0])
-            stack.append(id)
+        instructions = compile_pol(statement, self.literal_id_map)
         if self.loud:
-            print(statement)
-        for i in range(len(statement)):
-            if self.loud:
-                print("    ", statement[i], stack)
-            if statement[i] not in operations:
-                id = statement[i]
-                stack.append(id)
-            else:
-                temp = None
-                if statement[i] == '+':
-                    # print("ADDING CONSTRAINT")
-                    constraint_2 = stack.pop()
-                    if not isinstance(constraint_2, Constraint):
-                        # print(constraint_2, "CONSTRAINT 2 IS NOT A CONSTRAINT")
-                        if constraint_2.isdigit():
-                            # print(constraint_2)
-                            # print("CONSTRAINT 2 IS A DIGIT")
-                            antecedents.append(int(constraint_2))
-                            constraint_2 = self.get_constraint(int(constraint_2))
-                        else:
-                            # print("CONSTRAINT 2 IS A LITERAL")
-                            if constraint_2[0] == "~":
-                                constraint_2 = Constraint([-self.literal_id_map[constraint_2[1:]]], [1], 0)
-                            else:
-                                constraint_2 = Constraint([self.literal_id_map[constraint_2]], [1], 0)
-                    constraint_1 = stack.pop()
-                    # print(constraint_1)
-                    if not isinstance(constraint_1, Constraint):
-                        # print(constraint_1, "CONSTRAINT 1 IS NOT A CONSTRAINT")
-                        if constraint_1.isdigit():
-                            # print(constraint_1, "CONSTRAINT 1 IS A DIGIT")
-                            antecedents.append(int(constraint_1))
-                            constraint_1 = self.get_constraint(int(constraint_1))
-                        else:
-                            if constraint_1[0] == "~":
-                                constraint_1 = Constraint([-self.literal_id_map[constraint_1[1:]]], [1], 0)
-                            else:
-                                constraint_1 = Constraint([self.literal_id_map[constraint_1]], [1], 0)
-                    temp = constraint_1 + constraint_2
-                    # if self.loud:
-                    #     print("adding", constraint_1, constraint_2, temp)
-                elif statement[i] == '-':
-                    constraint_2 = stack.pop()
-                    if not isinstance(constraint_2, Constraint):
-                        if constraint_2.isdigit():
-                            constraint_2 = self.get_constraint(int(constraint_2))
-                        else:
-                            if constraint_2[0] == "~":
-                                constraint_2 = Constraint([-self.literal_id_map[constraint_2[1:]]], [1], 0)
-                            else:
-                                constraint_2 = Constraint([self.literal_id_map[constraint_2]], [1], 0)
-                    constraint_1 = stack.pop()
-                    if not isinstance(constraint_1, Constraint):
-                        if constraint_1.isdigit():
-                            constraint_1 = self.get_constraint(int(constraint_1))
-                        else:
-                            if constraint_1[0] == "~":
-                                constraint_1 = Constraint([-self.literal_id_map[constraint_1[1:]]], [1], 0)
-                            else:
-                                constraint_1 = Constraint([self.literal_id_map[constraint_1]], [1], 0)
-                    temp = constraint_1 - constraint_2
-                elif statement[i] == '*':
-                    constraint_2 = stack.pop()
-                    constraint_2 = int(constraint_2)
-                    constraint_1 = stack.pop()
-                    if not isinstance(constraint_1, Constraint):
-                        if constraint_1.isdigit():
-                            constraint_1 = self.get_constraint(int(constraint_1))
-                            antecedents.append(int(constraint_1))
-                        else:
-                            if constraint_1[0] == "~":
-                                constraint_1 = Constraint([-self.literal_id_map[constraint_1[1:]]], [1], 0)
-                            else:
-                                constraint_1 = Constraint([self.literal_id_map[constraint_1]], [1], 0)
-                    temp = constraint_1 * constraint_2
-                elif statement[i] == 'd':
-                    # print("DIVIDING CONSTRAINT")
-                    constraint_2 = stack.pop()
-                    constraint_2 = int(constraint_2)
-                    constraint_1 = stack.pop()
-                    if not isinstance(constraint_1, Constraint):
-                        if constraint_1.isdigit():
-                            constraint_1 = self.get_constraint(int(constraint_1))
-                            antecedents.append(int(constraint_1))
-                        else:
-                            if constraint_1[0] == "~":
-                                constraint_1 = Constraint([-self.literal_id_map[constraint_1[1:]]], [1], 0)
-                            else:
-                                constraint_1 = Constraint([self.literal_id_map[constraint_1]], [1], 0)
-                    temp = constraint_1 / constraint_2
-                    if self.loud:
-                        print("dividing", constraint_1, constraint_2, temp)
-                constr = copy.deepcopy(temp)
-                stack.append(constr)
-                temp = None
-        self.logger.warning(
-            str(self.no_of_constraints+1)+":"+" ".join([str(i) for i in antecedents]))
-        self.add_constraint(stack.pop())
+            print("    ", instructions)
+        constraint, antecedents = evaluate_pol(instructions, self.get_constraint)
+        self.rup_writer.write(self.no_of_constraints+1, antecedents)
+        self.add_constraint(constraint)
 
     def admit_j_step(self, line: str) -> None:
         """
@@ -291,8 +198,7 @@ class Model:
         antecedents = [int(antecedent)]
         constraint = self.constraint_parser(constraint_string)
         self.add_constraint(constraint)
-        self.logger.warning(
-            str(self.no_of_constraints)+":"+" ".join([str(i) for i in antecedents]))
+        self.rup_writer.write(self.no_of_constraints, antecedents)
 
     def admit_rup_step(self, line: str) -> None:
         """
@@ -317,63 +223,73 @@ class Model:
         Returns True if the constraint is redundant to the model.
         Else returns False.
         """
-        # if self.loud:
-        #     print("⭐", self.constraint_str(rup_constraint),"⭐", rup_constraint)
-        tau = rup_constraint.propagate([])
-        # print(tau)
-        tau = list(rup_constraint.literals)
-        # print(tau)
-        fired_constraints = []
-        if self.loud:
-            print("    ASSIGNMENT: ", tau)
-        while True:
-            for i in range(1, self.no_of_constraints+1):
-                if i not in self.dead_constraints:
-                    constraint = self.get_constraint(i)
-                    if constraint.is_unsatisfied(tau):
-                        fired_constraints.append(i)
-                        # if self.loud:
-                        #     print("    FIRED CONSTRAINTS: ", fired_constraints)
-                        self.logger.warning(
-                            str(self.no_of_constraints+1)+":"+" ".join([str(i) for i in fired_constraints]))
-                        self.constraints_known_to_propagate.update(fired_constraints)
-                        return True
-            if rup_constraint.is_unsatisfied(tau):
-                self.logger.warning(str(self.no_of_constraints+1)+":"+" ".join([str(i) for i in fired_constraints]))
+        hint = self.hints.get(self.no_of_constraints+1)
+        if hint is not None:
+            fired_constraints = self.hinted_rup(rup_constraint, hint)
+            if fired_constraints is not None:
+                self.rup_writer.write(self.no_of_constraints+1, fired_constraints)
                 return True
+        fired_constraints = self.propagator.refute(rup_constraint, self.constraints_known_to_propagate)
+        if fired_constraints is None:
+            if self.loud:
+                print("    NOT RUP")
+            return False
+        self.rup_writer.write(self.no_of_constraints+1, fired_constraints)
+        self.constraints_known_to_propagate.update(self.propagator.fired)
+        self.constraints_known_to_propagate.update(fired_constraints)
+        return True
+
+    def hinted_rup(self, rup_constraint: Constraint, hint: List[int]) -> Optional[List[int]]:
+        """
+        Propagates the negated constraint over the hinted constraints alone,
+        which is enough for the steps of a trimmed proof.
+        :return: the ids of the hinted constraints the conflict depends on,
+            in the order of the hint, or None if they do not refute the
+            constraint and the full check has to be done.
+        """
+        ids = [0] + [i for i in hint if self.arena.is_alive(i)]
+        constraints = [rup_constraint] + [self.get_constraint(i) for i in ids[1:]]
+        tau = Assignment(self.no_of_literals)
+        # variable -> (row of its reason, trail position, trail length when the reason propagated)
+        reasons = {}
+        unit_propagated = True
+        while unit_propagated:
             unit_propagated = False
-            for i in self.constraints_known_to_propagate:
-                constraint = self.get_constraint(i)
-                constraint_propagates = constraint.propagate(tau)
-                if constraint_propagates != []:
-                    fired_constraints.append(i)
-                    tau += constraint_propagates
+            for row, constraint in enumerate(constraints):
+                if constraint.slack(tau) < 0:
+                    needed = self.conflict_rows(constraints, row, tau, reasons)
+                    return [ids[i] for i in sorted(needed) if i != 0]
+                propagated_at = len(tau)
+                for literal in constraint.propagate(tau):
+                    reasons[abs(literal)] = (row, len(tau), propagated_at)
+                    tau.assign(literal)
                     unit_propagated = True
-                    # if self.loud:
-                    #     print("    FIRED CONSTRAINT: ", i)
-                    break
-            if not unit_propagated:
-                for i in range(1, self.no_of_constraints+1):
-                    constraint = self.get_constraint(i)
-                    constraint_propagates = constraint.propagate(tau)
-                    if constraint_propagates != []:
-                        fired_constraints.append(i)
-                        tau += constraint_propagates
-                        unit_propagated = True
-                        # if self.loud:
-                        #     print("    FIRED CONSTRAINT: ", i)
-                        break
-            if not unit_propagated:
-                constraint_propagates = rup_constraint.propagate(tau)
-                print("SELF PROPAGATES:", constraint_propagates)
-                if constraint_propagates != []:
-                    tau += constraint_propagates
-                    unit_propagated = True
-                    break
-            if not unit_propagated:
-                if self.loud:
-                    print("    NOT RUP BUT PREVIOUSLY FIRED FIRED CONSTRAINTS: ", fired_constraints)
-                return False
+        return None
+
+    @staticmethod
+    def conflict_rows(constraints: List[Constraint], row: int, tau: Assignment,
+                      reasons: Dict[int, Tuple[int, int, int]]) -> Set[int]:
+        """
+        :return: the rows of the falsified constraint `row` and of the reasons
+            of the literals it, and in turn those reasons, found falsified.
+        """
+        needed = {row}
+        stack = [(row, len(tau))]
+        while stack:
+            row, assigned_before = stack.pop()
+            for literal in constraints[row].literal_array:
+                reason = reasons.get(abs(literal))
+                if reason is not None and -literal in tau and reason[1] < assigned_before \
+                        and reason[0] not in needed:
+                    needed.add(reason[0])
+                    stack.append((reason[0], reason[2]))
+        return needed
+
+    def close(self) -> None:
+        """
+        Writes out and closes the .rup file.
+        """
+        self.rup_writer.close()
 
     def constraint_str(self, constraint:Constraint) -> str:
         """
@@ -381,12 +297,11 @@ class Model:
         """
         id_literal_map = {v: k for k, v in self.literal_id_map.items()}
         constraint_string = ""
-        # print(constraint.coefficients)
-        for i in constraint.literals:
+        for i, coefficient in zip(constraint.literal_array, constraint.coefficient_array):
             if i < 0:
-                constraint_string += " "+ str(constraint.coefficients[i]) + " ~" + str(id_literal_map[abs(i)])
+                constraint_string += " "+ str(coefficient) + " ~" + str(id_literal_map[abs(i)])
             else:
-                constraint_string += " "+ str(constraint.coefficients[i]) + " " + str(id_literal_map[abs(i)])
+                constraint_string += " "+ str(coefficient) + " " + str(id_literal_map[abs(i)])
         constraint_string += " >= "
         constraint_string += str(constraint.degree)
         return constraint_string
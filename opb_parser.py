@@ -0,0 +1,80 @@
+"""
+OPB Parser
+Parses OPB model files, and the constraints of proof steps, straight into
+Constraint objects. Shared by the forward and backward models.
+"""
+
+from typing import Dict, List, Tuple
+import re
+from constraint import Constraint
+
+HEADER = re.compile(r"#variable=\s*(\d+)\s+#constraint=\s*(\d+)")
+
+
+def parse_constraint(text: str, literal_id_map: Dict[str, int], signed_ids: Dict[str, int] = None) -> Constraint:
+    """
+    :param: text: the constraint, e.g. `1 x1 2 ~x2 >= 1 ;`
+    :param: literal_id_map: the ids of the variables by name,
+        new variables are added to it
+    :param: signed_ids: the literal of each name seen so far, `~` included,
+        kept by the caller when it parses many constraints
+    :return: the constraint object
+    """
+    lhs, separator, rhs = text.partition(">=")
+    if not separator:
+        raise ValueError("Not a >= constraint: " + text.strip())
+    degree = int(rhs.rstrip().rstrip(";"))
+    tokens = lhs.split()
+    names = tokens[1::2]
+    coefficients = list(map(int, tokens[0::2]))
+    if len(coefficients) != len(names):
+        raise Exception(
+            "unequal number of literals and coefficients")
+    if signed_ids is None:
+        signed_ids = {}
+    try:
+        literals = list(map(signed_ids.__getitem__, names))
+    except KeyError:
+        literals = [signed_ids.get(name) or signed_literal(name, literal_id_map, signed_ids) for name in names]
+    return Constraint.from_lists(literals, coefficients, degree)
+
+
+def signed_literal(name: str, literal_id_map: Dict[str, int], signed_ids: Dict[str, int]) -> int:
+    """
+    :return: the literal of the name, after adding the variable to
+        `literal_id_map` if it is new and both its literals to `signed_ids`.
+    """
+    variable = name[1:] if name[0] == "~" else name
+    id = literal_id_map.setdefault(variable, len(literal_id_map) + 1)
+    signed_ids[variable] = id
+    signed_ids["~" + variable] = -id
+    return signed_ids[name]
+
+
+def parse_opb(filename: str, literal_id_map: Dict[str, int]) -> Tuple[int, int, List[Constraint]]:
+    """
+    :param: filename: the OPB file
+    :param: literal_id_map: the ids of the variables by name,
+        new variables are added to it
+    :return: the number of variables and of constraints given in
+        the header, and the constraints of the file in order.
+    """
+    expected_no_of_literals = 0
+    expected_no_of_constraints = 0
+    constraints = []
+    signed_ids = {}
+    with open(filename, mode="r", encoding="utf-8") as file:
+        text = file.read()
+    for line in text.splitlines():
+        if not line or line[0] in " \t":
+            line = line.strip()
+            if not line:
+                continue
+        if line[0] == "*":
+            header = HEADER.search(line)
+            if header is not None:
+                expected_no_of_literals = int(header.group(1))
+                expected_no_of_constraints = int(header.group(2))
+            continue
+        constraints.append(parse_constraint(line, literal_id_map, signed_ids))
+    return expected_no_of_literals, expected_no_of_constraints, constraints
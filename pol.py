@@ -0,0 +1,113 @@
+"""
+Pol Step Evaluator
+Compiles the polish notation of a pol step into a list of instructions,
+evaluated the same way by the forward and backward models.
+"""
+
+from typing import Callable, Dict, List, Tuple, Union
+from constraint import Constraint, LinearCombination
+
+# opcodes of the instructions, each instruction is (opcode, argument)
+CONSTRAINT = 0  # push the constraint with id `argument`
+LITERAL = 1  # push the literal axiom `argument >= 0`
+ADD = 2
+SUBTRACT = 3
+MULTIPLY = 4  # multiply by `argument`
+DIVIDE = 5  # divide by `argument`, rounding up
+SATURATE = 6
+
+OPERATORS = {"+": ADD, "-": SUBTRACT, "*": MULTIPLY, "d": DIVIDE, "s": SATURATE}
+
+
+def compile_pol(statement: str, literal_id_map: Dict[str, int]) -> List[Tuple[int, int]]:
+    """
+    :param: statement: the pol line, e.g. `p 1 2 + 3 * 2 d 0`
+    :param: literal_id_map: the ids of the variables by name
+    :return: the instructions computing the derived constraint.
+    """
+    tokens = statement.split()[1:]
+    # proofs before version 1.2 end the statement with 0
+    if tokens and tokens[-1] == "0":
+        tokens.pop()
+    if not tokens:
+        raise ValueError("Empty pol statement")
+    instructions = []
+    for token in tokens:
+        opcode = OPERATORS.get(token)
+        if opcode is None:
+            if token.isdigit():
+                instructions.append((CONSTRAINT, int(token)))
+            elif token[0] == "~":
+                instructions.append((LITERAL, -literal_id_map[token[1:]]))
+            else:
+                instructions.append((LITERAL, literal_id_map[token]))
+        elif opcode == MULTIPLY or opcode == DIVIDE:
+            # the factor is the number in front of the operator
+            if not instructions or instructions[-1][0] != CONSTRAINT:
+                raise ValueError("Missing factor in pol statement: " + statement)
+            instructions.append((opcode, instructions.pop()[1]))
+        else:
+            instructions.append((opcode, 0))
+    return instructions
+
+
+def referenced_ids(statement: str) -> List[int]:
+    """
+    :param: statement: the pol line
+    :return: the ids of the constraints the statement uses, in order,
+        without compiling it. Factors of `*` and `d` are not ids.
+    """
+    tokens = statement.split()[1:]
+    if tokens and tokens[-1] == "0":
+        tokens.pop()
+    return [int(token) for token, after in zip(tokens, tokens[1:] + [""])
+            if token.isdigit() and after != "*" and after != "d"]
+
+
+def evaluate_pol(instructions: List[Tuple[int, int]],
+                 get_constraint: Callable[[int], Constraint]) -> Tuple[Constraint, List[int]]:
+    """
+    :param: instructions: the instructions from `compile_pol`
+    :param: get_constraint: looks up a constraint by id
+    :return: the derived constraint and the ids of the constraints it uses,
+        in the order they appear in the statement.
+    """
+    antecedents = []
+    # operands are only turned into linear combinations once they are modified
+    stack: List[Union[LinearCombination, Constraint, int]] = []
+    push = stack.append
+    pop = stack.pop
+
+    def accumulator(item) -> LinearCombination:
+        if isinstance(item, LinearCombination):
+            return item
+        if isinstance(item, int):
+            return LinearCombination().add_literal(item)
+        return LinearCombination(item)
+
+    for opcode, argument in instructions:
+        if opcode == CONSTRAINT:
+            antecedents.append(argument)
+            push(get_constraint(argument))
+        elif opcode == LITERAL:
+            push(argument)
+        elif opcode == ADD or opcode == SUBTRACT:
+            right = pop()
+            left = accumulator(pop())
+            multiplier = 1 if opcode == ADD else -1
+            if isinstance(right, LinearCombination):
+                left.add_combination(right, multiplier)
+            elif isinstance(right, int):
+                left.add_literal(right, multiplier)
+            else:
+                left.add(right, multiplier)
+            push(left)
+        elif opcode == MULTIPLY:
+            push(accumulator(pop()).multiply(argument))
+        elif opcode == DIVIDE:
+            push(accumulator(pop()).divide(argument))
+        else:
+            push(accumulator(pop()).saturate())
+    if len(stack) != 1:
+        raise ValueError("Malformed pol statement")
+    return accumulator(pop()).to_constraint(), antecedents
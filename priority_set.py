@@ -1,24 +1,57 @@
-import heapq
+from typing import Iterable, Iterator, Union
+
 
 class PrioritySet(object):
+    """
+    Set of constraint ids popped largest first. Ids are dense, so the set
+    is a bytearray of flags and pop moves a cursor down to the next flag.
+    """
     def __init__(self):
-        self.heap = []
-        self.set = set()
-
-    def add(self, d):
-        if type(d) is list:
-            [self.add(i) for i in d]
-        else:
-            if not d in self.set:
-                heapq.heappush(self.heap, -d)
-                self.set.add(d)
-
-    def pop(self):
-        d = heapq.heappop(self.heap)
-        d= -d
-        self.set.remove(d)
+        self.flags = bytearray(1)
+        self.count = 0
+        # no id above the cursor is in the set
+        self.cursor = 0
+
+    def add(self, d: Union[int, Iterable[int]]):
+        if type(d) is int:
+            d = (d,)
+        flags = self.flags
+        for i in d:
+            if i >= len(flags):
+                flags.extend(bytes(max(i + 1, 2 * len(flags)) - len(flags)))
+            if not flags[i]:
+                flags[i] = 1
+                self.count += 1
+                if i > self.cursor:
+                    self.cursor = i
+
+    def pop(self) -> int:
+        if self.count == 0:
+            raise IndexError("pop from an empty PrioritySet")
+        d = self.flags.rfind(1, 0, self.cursor + 1)
+        self.flags[d] = 0
+        self.count -= 1
+        self.cursor = d
         return d
-    
-    def empty(self):
-        return len(self.heap) == 0
-    
\ No newline at end of file
+
+    def empty(self) -> bool:
+        return self.count == 0
+
+    def __contains__(self, d: int) -> bool:
+        return 0 <= d < len(self.flags) and self.flags[d] == 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[int]:
+        """
+        Iterates over the ids largest first, without copying the set.
+        """
+        flags = self.flags
+        end = self.cursor + 1
+        while True:
+            d = flags.rfind(1, 0, end)
+            if d < 0:
+                return
+            yield d
+            end = d
@@ -1,30 +1,52 @@
 from model import Model
 from collections import defaultdict
-import logging
+from proof_reader import ProofReader
+from antecedent_writer import read_antecedents
 # pylint: disable=R0903
 class Proof:
     """
     Class to parse a proof file and admit the steps to the model
     """
 
-    def __init__(self, file, loud=False):
+    def __init__(self, file, loud=False, deletions=False, memory_cap=None, binary_rup=False, rup_writer=None,
+                 hints=None):
+        """
+        deletions: whether to apply the d and w lines. The trimmed proof drops
+        them anyway, so RUP checks may use deleted constraints. Applying them
+        makes each check faster (forward g2-g3 takes 4s instead of 11s) but
+        the core larger (g2-g3 keeps 637 steps instead of 571, g4-g10 87
+        instead of 44), so it is off by default
+        memory_cap: if given, the bytes of constraints and of their index the model keeps in memory
+        binary_rup: whether to write the .rup file in the binary format
+        rup_writer: where the model writes the antecedents instead of the .rup file
+        hints: a .rup file whose antecedents the RUP steps are checked against
+        first, e.g. the .hints file written next to a trimmed proof
+        """
         self.proof_file = file + '.veripb'
-        self.model = Model(file + '.opb', loud=loud)
+        self.model = Model(file + '.opb', loud=loud, memory_cap=memory_cap, binary_rup=binary_rup,
+                           rup_writer=rup_writer, hints=read_antecedents(hints) if hints else None)
         self.no_of_formulas = self.model.no_of_constraints
         self.loud = loud
-        self.parse()
+        self.deletions = deletions
+        try:
+            self.parse()
+        finally:
+            self.model.close()
 
     def parse(self):
         """
         Parses the proof file and admits the steps to the model
         """
-        wipeout = defaultdict(set)
+        # the constraints derived at each level, as runs [first, last] of ids
+        wipeout = defaultdict(list)
         active_level = 0
-        with open(self.proof_file, mode="r", encoding="utf-8") as file:
-            for line in file:
-                if line[0] == '*':
+        with ProofReader(self.proof_file) as reader:
+            for step, start, end in reader:
+                if step == '*':
                     if self.loud:
-                        print("COMMENT: ", line[:-1])
+                        print("COMMENT: ", reader.line(start, end)[:-1])
+                    continue
+                line = reader.line(start, end)
                 if line[0] == '#':
                     line = line[1:].split()
                     lvl = int(line[0])
@@ -46,7 +68,11 @@ class Proof:
                     if self.loud:
                         print("POL STEP: ", line[:-1])
                     self.model.admit_pol_step(line)
-                    wipeout[active_level].add(self.model.no_of_constraints)
+                    runs = wipeout[active_level]
+                    if runs and runs[-1][1] == self.model.no_of_constraints - 1:
+                        runs[-1][1] = self.model.no_of_constraints
+                    else:
+                        runs.append([self.model.no_of_constraints, self.model.no_of_constraints])
                 elif line[0] == 'u':
                     if self.loud:
                         print("RUP STEP: ", line[:-1])
@@ -61,20 +87,25 @@ class Proof:
                     self.model.admit_v_step(line)
                 elif line[0] == 'c':
                     self.model.admit_check_contradiction(line)
-                elif line[0] == 'w':
+                elif line[0] == 'd' and self.deletions:
+                    ids = line.split()[1:]
+                    # proofs before version 1.2 end the statement with 0
+                    if ids and ids[-1] == "0":
+                        ids.pop()
+                    if self.loud:
+                        print("DELETING: ", ids)
+                    for i in ids:
+                        self.model.delete_constraint(int(i))
+                elif line[0] == 'w' and self.deletions:
                     lvl = int(line.split()[1])
-                    to_delete = set()
-                    # if self.loud:
-                    #     print("WIPING OUT LEVELS: ", lvl)
-                    # print(wipeout)
-                    # for i in wipeout.keys():
-                    #     if i >= lvl:
-                    #         to_delete |= wipeout[i]
-                    #         wipeout[i] = set()
-                    # print("deleting: ", to_delete)
-                    # for i in to_delete:
-                    #     self.model.delete_constraint(i)
-        logging.shutdown()
+                    if self.loud:
+                        print("WIPING OUT LEVELS: ", lvl)
+                    for i in wipeout.keys():
+                        if i >= lvl:
+                            for first, last in wipeout[i]:
+                                for j in range(first, last + 1):
+                                    self.model.delete_constraint(j)
+                            wipeout[i] = []
 
 
 if "__main__" == __name__:
@@ -0,0 +1,54 @@
+"""
+Proof Reader
+Memory-mapped reader for .veripb proof files, shared by both proofs and make_smol.
+"""
+
+from typing import Iterator, Tuple
+import mmap
+
+
+class ProofReader:
+    """
+    Iterates over the lines of a proof file as (step type, start, end)
+    records, where the byte span includes the line break. Lines are only
+    decoded when asked for.
+    """
+    def __init__(self, filename: str):
+        self.file = open(filename, mode="rb")
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped
+            self.data = b""
+
+    def __iter__(self) -> Iterator[Tuple[str, int, int]]:
+        data = self.data
+        find = data.find
+        size = len(data)
+        start = 0
+        while start < size:
+            end = find(b"\n", start) + 1
+            if end == 0:
+                end = size
+            yield chr(data[start]), start, end
+            start = end
+
+    def line(self, start: int, end: int) -> str:
+        """
+        :return: the decoded line in the byte span.
+        """
+        return self.data[start:end].decode("utf-8")
+
+    def startswith(self, prefix: bytes, start: int) -> bool:
+        return self.data[start:start + len(prefix)] == prefix
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self) -> 'ProofReader':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,480 @@
+"""
+Unit Propagation Engine
+Shared by the forward and backward models for RUP checks.
+"""
+
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from collections import deque
+import heapq
+from constraint import Constraint
+from assignment import Assignment
+
+# constraint flags
+WATCHED = 1  # the constraint is part of the database the RUP checks are against
+INDEXED = 2  # its terms are in the occurrence index and its slack is kept up to date
+SUSPENDED = 4  # it is watched but left out of the propagation for the memory budget
+USED = 8  # it propagated since the clock last went past it
+# rough size in bytes of the occurrence index of a literal besides its terms
+LITERAL_OVERHEAD = 200
+# bytes of an entry of the occurrence index, an id and a coefficient
+ENTRY_SIZE = 16
+# bytes of the flags and slack slot of an id
+ID_SIZE = 9
+# bytes of the int object of the slack of an indexed constraint
+SLACK_SIZE = 32
+
+
+class Propagator:
+    """
+    Propagates over the watched constraints with a trail and a queue of
+    pending literals. The unit consequences of the database are kept on a
+    root-level trail, which is only extended when constraints are watched
+    and is the starting point of every RUP check.
+
+    The occurrence index holds the ids and coefficients of the constraints
+    containing a literal in a pair of lists (arrays would box their items
+    on every access), the slacks are kept in a list by id. The entries of
+    unwatched constraints are only dropped once they make up a quarter of
+    the index, until then watching them again is free.
+
+    With a `memory_budget` (in bytes), watched constraints are suspended
+    once the index goes over it: their entries are dropped and they are
+    only gone over, reading them back with `get_constraint`, when the
+    rest of the database does not refute a constraint. Those that
+    propagated recently are suspended last. The lists of the literals
+    and the flags and slack slots of the ids are counted but cannot be
+    suspended, the budget has to leave room for them.
+    """
+    # id under which the negated constraint of a RUP check is propagated
+    RUP_ID = 0
+
+    def __init__(self, get_constraint: Callable[[int], Constraint], memory_budget: int = None):
+        self.get_constraint = get_constraint
+        self.memory_budget = memory_budget
+        # literal -> (ids, coefficients) of the indexed constraints containing it
+        self.occurrences: Dict[int, Tuple[List[int], List[int]]] = {}
+        self.no_of_entries = 0
+        self.no_of_indexed = 0
+        # entries of the constraints that are indexed but no longer watched or suspended
+        self.no_of_stale_entries = 0
+        # slack of the indexed constraints in the current assignment, by id
+        self.slack = [0]
+        self.flags = bytearray(1)
+        self.no_of_suspended = 0
+        # the next id the clock looks at to suspend, it goes down from the newest
+        # constraints so the ones they were derived from stay in the index longest
+        self.hand = 1
+        # the size the index has to grow to before suspending again
+        self.next_check = 0
+        # terms and slack of the negated constraint of the running RUP check
+        self.rup_terms: Dict[int, int] = {}
+        self.rup_slack = 0
+        # watched constraints that propagate on the empty assignment
+        self.root_propagating: Set[int] = set()
+        self.assignment = Assignment()
+        self.trail = self.assignment.trail
+        # trail position and reason of the assigned literals, by variable
+        self.position: List[int] = [0]
+        self.reason: List[int] = [0]
+        self.queue = deque()
+        # ids of the constraints found to propagate, core-first ones and the rest
+        self.propagating: List[int] = []
+        self.deferred: List[int] = []
+        # reasons of the literals propagated by the last RUP check
+        self.fired: List[int] = []
+        self.root_trail_length = 0
+        self.root_conflict: Optional[int] = None
+        self.root_reasons: Set[int] = set()
+        self.root_stale = False
+        self.not_at_root: List[int] = []
+        self.rup_constraint: Optional[Constraint] = None
+
+    def constraint(self, id: int) -> Constraint:
+        if id == self.RUP_ID:
+            return self.rup_constraint
+        return self.get_constraint(id)
+
+    def watch(self, id: int, constraint: Constraint) -> None:
+        """
+        Adds the constraint to the occurrence index, it is propagated
+        at the root level before the next RUP check.
+        """
+        if id >= len(self.flags):
+            extra = id + 1 - len(self.flags)
+            self.flags.extend(bytes(extra))
+            self.slack.extend([0] * extra)
+        if self.flags[id] & WATCHED:
+            return
+        self.activate(id, constraint)
+        self.flags[id] |= WATCHED
+        if constraint.is_unsatisfied([]) or constraint.propagate([]) != []:
+            self.root_propagating.add(id)
+        self.not_at_root.append(id)
+        self.keep_to_budget()
+
+    def unwatch(self, id: int, constraint: Constraint) -> None:
+        """
+        Removes the constraint from the occurrence index. The root trail
+        is rebuilt if the constraint was one of its reasons.
+        """
+        if not self.is_watched(id):
+            return
+        if self.flags[id] & SUSPENDED:
+            self.no_of_suspended -= 1
+        else:
+            self.no_of_stale_entries += len(constraint.literal_array)
+        self.flags[id] &= INDEXED
+        self.root_propagating.discard(id)
+        if id == self.root_conflict or id in self.root_reasons:
+            self.root_stale = True
+        if 4 * self.no_of_stale_entries > self.no_of_entries:
+            self.compact()
+
+    def is_watched(self, id: int) -> bool:
+        return id < len(self.flags) and self.flags[id] & WATCHED != 0
+
+    def is_active(self, id: int) -> bool:
+        """
+        :return: True if the constraint is watched and not suspended.
+        """
+        return self.flags[id] & (WATCHED | SUSPENDED) == WATCHED
+
+    def activate(self, id: int, constraint: Constraint) -> None:
+        """
+        Puts the constraint in the occurrence index, its entries are
+        only added if they were dropped since it was last in it.
+        """
+        if self.flags[id] & INDEXED:
+            self.no_of_stale_entries -= len(constraint.literal_array)
+        else:
+            self.index(id, constraint)
+
+    def index(self, id: int, constraint: Constraint) -> None:
+        """
+        Adds the constraint to the occurrence index with its slack in the current assignment.
+        """
+        self.make_room(constraint)
+        occurrences = self.occurrences
+        for literal, coefficient in zip(constraint.literal_array, constraint.coefficient_array):
+            occurrence = occurrences.get(literal)
+            if occurrence is None:
+                occurrence = occurrences[literal] = ([], [])
+            occurrence[0].append(id)
+            occurrence[1].append(coefficient)
+        self.no_of_entries += len(constraint.literal_array)
+        self.no_of_indexed += 1
+        self.slack[id] = constraint.slack(self.assignment)
+        self.flags[id] |= INDEXED
+
+    def compact(self) -> None:
+        """
+        Drops the entries of the constraints that are no longer watched or are suspended.
+        """
+        flags = self.flags
+        for literal, (ids, coefficients) in list(self.occurrences.items()):
+            kept = [i for i, id in enumerate(ids) if flags[id] & (WATCHED | SUSPENDED) == WATCHED]
+            if not kept:
+                del self.occurrences[literal]
+            elif len(kept) < len(ids):
+                ids[:] = map(ids.__getitem__, kept)
+                coefficients[:] = map(coefficients.__getitem__, kept)
+        for id in range(len(flags)):
+            if flags[id] & INDEXED and flags[id] & (WATCHED | SUSPENDED) != WATCHED:
+                flags[id] &= ~INDEXED
+                self.slack[id] = 0
+                self.no_of_indexed -= 1
+        self.no_of_entries -= self.no_of_stale_entries
+        self.no_of_stale_entries = 0
+
+    def index_bytes(self) -> int:
+        """
+        :return: the estimated size of the occurrence index, slacks and flags.
+        """
+        return ENTRY_SIZE * self.no_of_entries + LITERAL_OVERHEAD * len(self.occurrences) + \
+            ID_SIZE * len(self.flags) + SLACK_SIZE * self.no_of_indexed
+
+    def keep_to_budget(self) -> None:
+        """
+        Suspends watched constraints until the index is back to three
+        quarters of the memory budget. The clock goes round the ids
+        skipping, and clearing the mark of, the constraints that propagated
+        since it last went past them. The reasons of the root trail are not suspended.
+        """
+        if self.memory_budget is None or self.index_bytes() <= max(self.memory_budget, self.next_check):
+            return
+        flags = self.flags
+        kept = self.root_reasons | self.root_propagating | {self.root_conflict}
+        excess = self.index_bytes() - ENTRY_SIZE * self.no_of_stale_entries - 3 * self.memory_budget // 4
+        for _ in range(2 * len(flags)):
+            if excess <= 0:
+                break
+            id = self.hand
+            self.hand = id - 1 if id > 1 else len(flags) - 1
+            if not self.is_active(id) or id in kept:
+                continue
+            if flags[id] & USED:
+                flags[id] &= ~USED
+                continue
+            flags[id] |= SUSPENDED
+            self.no_of_suspended += 1
+            no_of_terms = len(self.get_constraint(id).literal_array)
+            self.no_of_stale_entries += no_of_terms
+            excess -= ENTRY_SIZE * no_of_terms + SLACK_SIZE
+        if self.no_of_stale_entries:
+            self.compact()
+        # what cannot be suspended may be over the budget, it is not gone round again until the index grows
+        self.next_check = self.index_bytes() + self.memory_budget // 4
+
+    def make_room(self, constraint: Constraint) -> None:
+        """
+        Grows the assignment to cover the variables of the constraint.
+        """
+        no_of_variables = abs(constraint.literal_array[-1]) if constraint.literal_array else 0
+        if no_of_variables > self.assignment.no_of_variables:
+            self.assignment.grow(no_of_variables)
+            extra = no_of_variables + 1 - len(self.reason)
+            self.position.extend([0] * extra)
+            self.reason.extend([0] * extra)
+
+    def assign(self, literal: int, reason: int) -> None:
+        """
+        Sets the literal to true and takes the coefficient of its negation
+        off the slack of the constraints containing it.
+        """
+        variable = abs(literal)
+        self.position[variable] = len(self.trail)
+        self.reason[variable] = reason
+        self.assignment.assign(literal)
+        self.queue.append(literal)
+        occurrence = self.occurrences.get(-literal)
+        if occurrence is not None:
+            slack = self.slack
+            for id, coefficient in zip(*occurrence):
+                slack[id] -= coefficient
+        coefficient = self.rup_terms.get(-literal)
+        if coefficient is not None:
+            self.rup_slack -= coefficient
+
+    def backtrack(self, length: int) -> None:
+        """
+        Unassigns the literals on the trail after `length`, giving the
+        constraints their slack back.
+        """
+        slack = self.slack
+        occurrences = self.occurrences
+        rup_terms = self.rup_terms
+        for literal in self.trail[length:]:
+            occurrence = occurrences.get(-literal)
+            if occurrence is not None:
+                for id, coefficient in zip(*occurrence):
+                    slack[id] += coefficient
+            if -literal in rup_terms:
+                self.rup_slack += rup_terms[-literal]
+        self.assignment.backtrack(length)
+        self.queue.clear()
+        self.propagating.clear()
+        self.deferred.clear()
+
+    def implied(self, id: int):
+        """
+        :return: the slack of the constraint and the unassigned
+            literals it propagates.
+        """
+        slack = self.rup_slack if id == self.RUP_ID else self.slack[id]
+        constraint = self.constraint(id)
+        if slack < 0 or slack >= constraint.max_coefficient:
+            return slack, []
+        values = self.assignment.values
+        return slack, [i for i, coefficient in zip(constraint.literal_array, constraint.coefficient_array)
+                       if coefficient > slack and not values[i] and not values[-i]]
+
+    def visit(self, id: int, preferred: Iterable[int]) -> bool:
+        """
+        Checks a constraint one of whose literals got falsified and
+        queues it up if it propagates.
+        :return: True if the constraint is falsified.
+        """
+        slack, implied = self.implied(id)
+        if slack < 0:
+            return True
+        if implied:
+            heapq.heappush(self.propagating if id in preferred else self.deferred, id)
+        return False
+
+    def fire(self, id: int) -> bool:
+        """
+        Assigns the literals the constraint propagates.
+        :return: True if the constraint is falsified.
+        """
+        slack, implied = self.implied(id)
+        self.flags[id] |= USED
+        for literal in implied:
+            self.assign(literal, id)
+        return slack < 0
+
+    def propagate(self, preferred: Iterable[int]) -> Optional[int]:
+        """
+        Checks the constraints falsified by the pending literals, then fires
+        the smallest propagating preferred constraint, or the smallest other
+        one if there is none, until a conflict or a fixpoint is reached.
+        :return: the id of a falsified constraint, or None.
+        """
+        occurrences = self.occurrences
+        rup_terms = self.rup_terms
+        flags = self.flags
+        mask = WATCHED | SUSPENDED
+        while True:
+            while self.queue:
+                falsified = -self.queue.popleft()
+                occurrence = occurrences.get(falsified)
+                if occurrence is not None:
+                    for id in occurrence[0]:
+                        if flags[id] & mask == WATCHED and self.visit(id, preferred):
+                            return id
+                if falsified in rup_terms and self.visit(self.RUP_ID, preferred):
+                    return self.RUP_ID
+            if self.propagating:
+                id = heapq.heappop(self.propagating)
+            elif self.deferred:
+                id = heapq.heappop(self.deferred)
+            else:
+                return None
+            if self.fire(id):
+                return id
+
+    def extend_root(self, preferred: Iterable[int]) -> None:
+        """
+        Propagates the constraints watched since the last RUP check on the
+        root-level trail, rebuilding it first if one of its reasons is gone.
+        """
+        if self.root_stale:
+            self.backtrack(0)
+            self.root_trail_length = 0
+            self.root_conflict = None
+            self.root_stale = False
+            self.not_at_root = list(self.root_propagating)
+        if self.root_conflict is not None:
+            self.not_at_root = []
+            return
+        for id in self.not_at_root:
+            if self.is_active(id) and self.visit(id, preferred):
+                self.root_conflict = id
+                break
+        self.not_at_root = []
+        if self.root_conflict is None:
+            self.root_conflict = self.propagate(preferred)
+        self.backtrack(len(self.trail))
+        self.root_trail_length = len(self.trail)
+        self.root_reasons = {self.reason[abs(i)] for i in self.trail}
+
+    def refute(self, rup_constraint: Constraint, preferred: Iterable[int] = ()) -> Optional[List[int]]:
+        """
+        :param: rup_constraint: the negation of the constraint to be checked
+        :param: preferred: ids of the constraints to propagate with first
+        :return: the ids of the constraints used to derive a conflict from
+            `rup_constraint`, in trail order with the falsified constraint
+            last, or None if there is no conflict.
+        """
+        self.extend_root(preferred)
+        if self.root_conflict is not None:
+            self.fired = []
+            return self.analyse(self.root_conflict)
+        self.rup_constraint = rup_constraint
+        self.make_room(rup_constraint)
+        self.rup_terms = dict(zip(rup_constraint.literal_array, rup_constraint.coefficient_array))
+        self.rup_slack = rup_constraint.slack(self.assignment)
+        try:
+            conflict = self.RUP_ID if self.fire(self.RUP_ID) else None
+            if conflict is None:
+                conflict = self.propagate(preferred)
+            if conflict is None and self.no_of_suspended:
+                conflict = self.propagate_suspended(preferred)
+            self.fired = [self.reason[abs(i)] for i in self.trail[self.root_trail_length:]
+                          if self.reason[abs(i)] != self.RUP_ID]
+            if conflict is None:
+                return None
+            return self.analyse(conflict)
+        finally:
+            self.backtrack(self.root_trail_length)
+            self.rup_terms = {}
+            self.rup_constraint = None
+            self.keep_to_budget()
+
+    def propagate_suspended(self, preferred: Iterable[int]) -> Optional[int]:
+        """
+        Goes over the suspended constraints for ones that are falsified or
+        propagate, putting them back in the index, until none of them does.
+        The preferred ones are gone over first, the rest only if none of them propagates.
+        :return: the id of a falsified constraint, or None.
+        """
+        found = True
+        while found:
+            conflict, found = self.resume_propagating(self.suspended_ids(preferred), preferred)
+            if conflict is None and not found:
+                conflict, found = self.resume_propagating(self.suspended_ids(), preferred)
+            if conflict is not None:
+                return conflict
+        return None
+
+    def suspended_ids(self, among: Iterable[int] = None) -> Iterator[int]:
+        flags = self.flags
+        for id in range(1, len(flags)):
+            if flags[id] & SUSPENDED and (among is None or id in among):
+                yield id
+
+    def resume_propagating(self, ids: Iterable[int], preferred: Iterable[int]) -> Tuple[Optional[int], bool]:
+        """
+        Puts the constraints among `ids` that are falsified or propagate back
+        in the index, then propagates with them in the usual order.
+        :return: the id of a falsified constraint or None, and whether any constraint was put back.
+        """
+        values = self.assignment.values
+        found = False
+        for id in ids:
+            constraint = self.get_constraint(id)
+            slack = constraint.slack(self.assignment)
+            if slack >= 0 and not any(coefficient > slack and not values[i] and not values[-i] for i, coefficient
+                                      in zip(constraint.literal_array, constraint.coefficient_array)):
+                continue
+            self.activate(id, constraint)
+            self.flags[id] &= ~SUSPENDED
+            self.no_of_suspended -= 1
+            # what it propagates at the root level is only found when it is visited there
+            self.not_at_root.append(id)
+            found = True
+            if self.visit(id, preferred):
+                return id, True
+        return (self.propagate(preferred) if found else None), found
+
+    def analyse(self, conflict: int) -> List[int]:
+        """
+        :return: the reasons of the propagated literals the conflict
+            depends on, in trail order, followed by `conflict`.
+        """
+        marked = set()
+        self.mark_falsified(conflict, len(self.trail), marked)
+        used = []
+        for position in range(len(self.trail) - 1, -1, -1):
+            literal = self.trail[position]
+            if literal in marked:
+                reason = self.reason[abs(literal)]
+                used.append(reason)
+                self.mark_falsified(reason, position, marked)
+        antecedents = []
+        seen = {self.RUP_ID, conflict}
+        for id in reversed(used):
+            if id not in seen:
+                seen.add(id)
+                antecedents.append(id)
+        if conflict != self.RUP_ID:
+            antecedents.append(conflict)
+        return antecedents
+
+    def mark_falsified(self, id: int, position: int, marked: Set[int]) -> None:
+        """
+        Marks the trail literals before `position` falsifying a literal of the constraint.
+        """
+        values = self.assignment.values
+        for literal in self.constraint(id).literal_array:
+            if values[-literal] and self.position[abs(literal)] < position:
+                marked.add(-literal)
@@ -0,0 +1,97 @@
+"""
+Slack Matrix
+Evaluates the slacks of a whole list of constraints at once, as a sparse
+matrix-vector product when NumPy is installed and in plain Python otherwise.
+"""
+
+from typing import Callable, Iterable
+from array import array
+from constraint import Constraint
+from assignment import Assignment
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# bound on the sum of the coefficients of a row for the int64 arithmetic
+MAX_ROW_SUM = 2 ** 62
+
+
+class SlackMatrix:
+    """
+    The constraints as a CSR matrix, one row per constraint in the given
+    order and one column per term, holding the coefficient of the term and
+    the position of its negation in `Assignment.values`.
+    """
+    def __init__(self, ids: Iterable[int], get_constraint: Callable[[int], Constraint], use_numpy: bool = True):
+        self.ids = list(ids)
+        self.constraints = [get_constraint(i) for i in self.ids]
+        self.max_coefficients = [constraint.max_coefficient for constraint in self.constraints]
+        self.use_numpy = use_numpy and np is not None and self.build()
+
+    def build(self) -> bool:
+        """
+        Builds the CSR arrays.
+        :return: False if a coefficient does not fit in 64 bits.
+        """
+        lengths = []
+        row_constants = []
+        for constraint in self.constraints:
+            if not isinstance(constraint.coefficient_array, array):
+                return False
+            total = sum(constraint.coefficient_array)
+            if total >= MAX_ROW_SUM or abs(constraint.degree) >= MAX_ROW_SUM:
+                return False
+            lengths.append(len(constraint.literal_array))
+            row_constants.append(total - constraint.degree)
+        self.indptr = np.zeros(len(self.constraints) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.indptr[1:])
+        if self.constraints:
+            self.columns = -np.concatenate([np.frombuffer(constraint.literal_array, dtype=np.int64)
+                                            for constraint in self.constraints])
+            self.coefficients = np.concatenate([np.frombuffer(constraint.coefficient_array, dtype=np.int64)
+                                                for constraint in self.constraints])
+        else:
+            self.columns = np.zeros(0, dtype=np.int64)
+            self.coefficients = np.zeros(0, dtype=np.int64)
+        self.row_constants = np.array(row_constants, dtype=np.int64)
+        self.nonempty = np.flatnonzero(self.indptr[1:] > self.indptr[:-1])
+        return True
+
+    def slacks(self, assignment: Assignment):
+        """
+        :return: the slacks of the constraints in the `assignment`, in row order.
+        """
+        if not self.use_numpy:
+            return [constraint.slack(assignment) for constraint in self.constraints]
+        values = np.frombuffer(assignment.values, dtype=np.uint8)
+        falsified = np.zeros(len(self.coefficients) + 1, dtype=np.int64)
+        np.cumsum(self.coefficients * values[self.columns], out=falsified[1:])
+        return self.row_constants - (falsified[self.indptr[1:]] - falsified[self.indptr[:-1]])
+
+    def is_satisfied(self, assignment: Assignment) -> bool:
+        """
+        :return: True if no constraint is falsified in the `assignment`.
+        """
+        if not self.use_numpy:
+            return all(constraint.slack(assignment) >= 0 for constraint in self.constraints)
+        return not len(self.constraints) or self.slacks(assignment).min() >= 0
+
+    def candidates(self, assignment: Assignment) -> Iterable[int]:
+        """
+        :return: the rows of the constraints that are falsified or may
+            propagate in the `assignment`, in row order. Without NumPy the
+            rows are found lazily, so stopping early skips the remaining slacks.
+        """
+        if not self.use_numpy:
+            return (row for row, constraint in enumerate(self.constraints)
+                    if constraint.slack(assignment) < self.max_coefficients[row])
+        # largest coefficient of an unassigned literal in each row
+        values = np.frombuffer(assignment.values, dtype=np.uint8)
+        unassigned = (values[self.columns] | values[-self.columns]) == 0
+        largest = np.zeros(len(self.constraints), dtype=np.int64)
+        if len(self.nonempty):
+            largest[self.nonempty] = np.maximum.reduceat(self.coefficients * unassigned,
+                                                         self.indptr[self.nonempty])
+        return np.flatnonzero(self.slacks(assignment) < largest).tolist()
@@ -1,94 +1,197 @@
-import pprint as pp
+from typing import List, Tuple
+from array import array
+import os
+from proof_reader import ProofReader
+from opb_parser import parse_constraint, parse_opb
+from antecedent_writer import AntecedentRecorder, AntecedentWriter, BUFFER_SIZE
+from antecedent_graph import AntecedentGraph, last_uses, load_graph, reachable
+from proof import Proof
+from stack_proof import Proof as StackProof
 
-def make_smol(file_name, read_dir, save_dir, loud=False):
-    graph_dict = {}
-    with open("rup/"+file_name+".rup", "r") as f:
-        for line in f.readlines():
-            proof_step_id, antecedent = line.split(":")
-            proof_step_id = int(proof_step_id)
-            antecedent = [int(x) for x in antecedent.split()]
-            graph_dict[proof_step_id] = antecedent
-
-    small_graph = {}
-
-    queue = [max(graph_dict.keys())]
-    steps_to_keep = set()
-    while queue:
-        node = queue.pop()
-        steps_to_keep.add(node)
-        if node not in small_graph:
-            if node in graph_dict:
-                small_graph[node] = graph_dict[node]
-                queue.extend(graph_dict[node])
-            else:
-                small_graph[node] = []
+def make_smol(file_name, read_dir, save_dir, loud=False, deletions=False, hints=False):
     if "stack_" not in file_name:
         PROOF_FILE = f"{read_dir}{file_name}.veripb"
     else:
         PROOF_FILE = f"{read_dir}{file_name[6:]}.veripb"
-    # print(sorted(list(steps_to_keep)))
-    with open(PROOF_FILE, "r") as f:
-        with open(f"{save_dir}smol_{file_name}.veripb", "w") as g:
-            model_step = 0
-            proof_step = 0
-            short_proof_step = 0
-            new_numbering = {}
-            for line in f.readlines():
-                # print(line.strip(),"⭐", proof_step+1)
-                if "pseudo" in line:
-                    g.write(line[:-1])
-                elif line[0] == "d":
-                    pass
-                elif line[0] == "f":
-                    model_step = int(line.split()[1])
-                    short_proof_step = model_step
-                    proof_step = model_step
-                    g.write("\n"+line[:-1])
-                    for i in range(1, model_step+1):
-                        new_numbering[i] = i
-                elif line[0] == "u":
-                    proof_step += 1
-                    if proof_step in steps_to_keep:
-                        short_proof_step += 1
-                        new_numbering[proof_step] = short_proof_step
-                        g.write("\n"+line[:-1])
-                elif line[0] == "j":
-                    proof_step += 1
-                    if proof_step in steps_to_keep:
-                        reformulated_line = line.split(" ")
-                        reformulated_line[1] = str(new_numbering[int(reformulated_line[1])])
-                        line = " ".join(reformulated_line)
-                        short_proof_step += 1
-                        new_numbering[proof_step] = short_proof_step
-                        g.write("\n"+line[:-1])
-                elif line[0] == "p":
-                    proof_step += 1
-                    if proof_step in steps_to_keep:
-                        reformulated_line = line.split(" ")
-                        for i in range(0, len(reformulated_line)):
-                            entry = reformulated_line[i]
-                            if entry.isdigit():
-                                if int(entry) > model_step:
-                                    reformulated_line[i] = str(new_numbering[int(entry)])
-                        short_proof_step += 1
-                        new_numbering[proof_step] = short_proof_step
-                        line = " ".join(reformulated_line)
-                        g.write("\n"+line[:-1])
-                elif line[0] == "c":
-                    reformulated_line = line.split(" ")
-                    reformulated_line[1] = str(new_numbering[int(reformulated_line[1])])
-                    line = " ".join(reformulated_line)
-                    g.write("\n"+line)
-                elif line[0] == "v":
-                    proof_step += 1
-                    if proof_step in steps_to_keep:
-                        short_proof_step += 1
-                        new_numbering[proof_step] = short_proof_step
-                        g.write("\n"+line[:-1])
-            g.write("\n* no of proof steps: "+ str(proof_step-model_step))
-            g.write("\n* no of short proof steps: "+str(short_proof_step-model_step))
-            g.write("\n* % of proof steps kept: "+ str((short_proof_step-model_step)/(proof_step-model_step)*100))
-            return (proof_step-model_step, short_proof_step-model_step)
+    with load_graph("rup/"+file_name+".rup") as graph:
+        return write_smol(graph, PROOF_FILE, f"{save_dir}smol_{file_name}.veripb", deletions, hints)
+
+
+def trim(file, save_dir, backwards=False, loud=False, memory_cap=None, deletions=False,
+         hints=False) -> Tuple[int, int]:
+    """
+    Trims a proof in one process, the antecedents are kept in memory
+    instead of going through a .rup file.
+    :param: file: the path of the .opb and .veripb files without the extension
+    :param: save_dir: where smol_<name>.veripb (smol_stack_<name>.veripb if
+        backwards) is written
+    :param: backwards: whether to use the backward checker
+    :param: deletions: whether to delete derived constraints after their last use
+    :param: hints: whether to write the antecedents of the RUP steps, see `write_smol`
+    :return: the number of proof steps in the original and the trimmed proof.
+    """
+    recorder = AntecedentRecorder()
+    name = file.split('/')[-1]
+    if backwards:
+        StackProof(file, loud=loud, backwards=True, memory_cap=memory_cap, rup_writer=recorder)
+        name = "stack_" + name
+    else:
+        Proof(file, loud=loud, memory_cap=memory_cap, rup_writer=recorder)
+    return write_smol(AntecedentGraph.from_dict(recorder.graph), file + ".veripb", f"{save_dir}smol_{name}.veripb",
+                      deletions, hints)
+
+
+def write_smol(graph: AntecedentGraph, proof_file: str, smol_file: str, deletions: bool = False,
+               hints: bool = False) -> Tuple[int, int]:
+    """
+    Writes the steps of the proof that the last step depends on, renumbered,
+    in one pass over the proof. The steps kept are copied as bytes, only the
+    ids in p, j, c and e lines are rewritten. The deletions, levels, wipe
+    outs and comments of the proof are dropped.
+    :param: graph: the antecedents of the steps
+    :param: deletions: whether to delete each derived constraint right after
+        the last step that uses it, so the verifier's database stays small
+    :param: hints: whether to write the renumbered antecedents of the steps
+        to `<smol_file>.hints`, in the .rup format, for `Proof` to check the
+        RUP steps against. RUP steps whose only antecedent implies them are
+        written as j steps, which the verifier checks without propagating.
+    :return: the number of proof steps in the original and the trimmed proof.
+    """
+    # flags by step id
+    steps_to_keep = reachable(graph)
+    no_of_flags = len(steps_to_keep)
+    # the derived constraints deleted after each step
+    dying = {}
+    if deletions:
+        uses = last_uses(graph, steps_to_keep)
+        for id in range(graph.first, len(uses)):
+            if uses[id]:
+                dying.setdefault(uses[id], []).append(id)
+    # the constraints of the only antecedents of steps, by id
+    sources = {}
+    hint_writer = None
+    if hints:
+        for id in range(graph.first, graph.last + 1):
+            if steps_to_keep[id] and graph.offsets[id + 1] - graph.offsets[id] == 1:
+                sources[graph.antecedents[graph.offsets[id]]] = None
+        hint_writer = AntecedentWriter(smol_file + ".hints")
+    literal_id_map = {}
+    with ProofReader(proof_file) as reader, open(smol_file, mode="wb", buffering=BUFFER_SIZE) as g:
+        data = reader.data
+        terminator = b"\n"
+        model_step = 0
+        proof_step = 0
+        short_proof_step = 0
+        # the new id by original id, 0 for the steps that are not kept
+        new_numbering = array("q", [0])
+        for step, start, end in reader:
+            if step in "pujv" and not reader.startswith(b"pseudo", start):
+                proof_step += 1
+                if proof_step < no_of_flags and steps_to_keep[proof_step]:
+                    short_proof_step += 1
+                    new_numbering.append(short_proof_step)
+                    # the constraint of the only antecedent of the step
+                    source = None
+                    if hints:
+                        antecedents = graph.antecedents_of(proof_step)
+                        hint_writer.write(short_proof_step, [new_numbering[id] for id in antecedents])
+                        if len(antecedents) == 1:
+                            source = sources[antecedents[0]]
+                        if step in "uj" and (proof_step in sources or source is not None):
+                            constraint = parse_constraint(step_constraint(data[start:end]), literal_id_map)
+                            if proof_step in sources:
+                                sources[proof_step] = constraint
+                    if step == "p":
+                        g.write(renumber_pol(data[start:end].split(), new_numbering, model_step))
+                    elif step == "j":
+                        g.write(renumber_id(data[start:end], new_numbering))
+                    elif step == "u" and source is not None and source.implies(constraint):
+                        g.write(b"j " + str(new_numbering[antecedents[0]]).encode() + b" "
+                                + step_constraint(data[start:end]).encode() + b"\n")
+                    else:
+                        g.write(data[start:end].rstrip(b"\r\n") + b"\n")
+                    if proof_step in dying:
+                        g.write(b"d " + b" ".join(str(new_numbering[id]).encode() for id in dying[proof_step])
+                                + terminator)
+                else:
+                    new_numbering.append(0)
+            elif step == "f":
+                model_step = int(data[start:end].split()[1])
+                short_proof_step = model_step
+                proof_step = model_step
+                new_numbering = array("q", range(model_step + 1))
+                opb_file = proof_file[:-len(".veripb")] + ".opb"
+                if any(id <= model_step for id in sources) and os.path.exists(opb_file):
+                    constraints = parse_opb(opb_file, literal_id_map)[2]
+                    for id in sources:
+                        if id <= model_step:
+                            sources[id] = constraints[id - 1]
+                g.write(data[start:end].rstrip(b"\r\n") + b"\n")
+            elif step == "c":
+                g.write(renumber_id(data[start:end], new_numbering))
+            elif step == "e":
+                id = int(data[start:end].split(None, 2)[1])
+                if id < len(new_numbering) and new_numbering[id]:
+                    g.write(renumber_id(data[start:end], new_numbering))
+            elif step == "p":
+                header = data[start:end].rstrip(b"\r\n")
+                # proofs before version 1.2 end deletions with 0
+                if proof_version(header) < (1, 2):
+                    terminator = b" 0\n"
+                g.write(header + b"\n")
+        g.write(("* no of proof steps: " + str(proof_step-model_step) + "\n").encode())
+        g.write(("* no of short proof steps: " + str(short_proof_step-model_step) + "\n").encode())
+        g.write(("* % of proof steps kept: " + str((short_proof_step-model_step)/(proof_step-model_step)*100) + "\n").encode())
+    if hint_writer is not None:
+        hint_writer.close()
+    return (proof_step-model_step, short_proof_step-model_step)
+
+
+def proof_version(header: bytes) -> Tuple[int, ...]:
+    """
+    :return: the version in the header line of a proof, e.g. (1, 2) for
+        "pseudo-Boolean proof version 1.2".
+    """
+    return tuple(int(part) for part in header.split()[-1].split(b"."))
+
+
+def step_constraint(line: bytes) -> str:
+    """
+    :return: the constraint of a u or j line.
+    """
+    if line[:1] == b"j":
+        return line.split(None, 2)[2].decode("utf-8").strip()
+    return line[1:].decode("utf-8").strip()
+
+
+def renumber_id(line: bytes, new_numbering: array) -> bytes:
+    """
+    :return: the line with the id after the statement type renumbered.
+    :raises ValueError: if the step with the id is not kept.
+    """
+    tokens = line.split(None, 2)
+    id = int(tokens[1])
+    if id >= len(new_numbering) or not new_numbering[id]:
+        raise ValueError("step " + str(id) + " is not in the trimmed proof: " + line.decode().strip())
+    tokens[1] = str(new_numbering[id]).encode()
+    return b" ".join(tokens).rstrip(b"\r\n") + b"\n"
+
+
+def renumber_pol(tokens: List[bytes], new_numbering: array, model_step: int) -> bytes:
+    """
+    :param: tokens: the tokens of the pol line
+    :return: the line with the ids of derived constraints renumbered, the
+        factors of `*` and `d` are left as they are.
+    """
+    last = len(tokens) - 1
+    for i in range(1, len(tokens)):
+        token = tokens[i]
+        if token.isdigit() and (i == last or tokens[i + 1] not in (b"*", b"d")):
+            id = int(token)
+            if id > model_step:
+                tokens[i] = str(new_numbering[id]).encode()
+    return b" ".join(tokens) + b"\n"
+
 
 if "__main__" == __name__:
     make_smol("g2-g3", "sip_proofs/", "sip_proofs/", loud=True)
\ No newline at end of file
@@ -1,25 +1,49 @@
 from constraint import Constraint
-from typing import Iterable, Dict, List
-import copy
-import logging
+from assignment import Assignment
+from typing import List, Optional
+from collections import defaultdict, deque
 # from queue import PriorityQueue
 from priority_set import PrioritySet
+from propagator import Propagator
+from pol import compile_pol, evaluate_pol
+from slack_matrix import SlackMatrix
+from opb_parser import parse_constraint, parse_opb
+from constraint_arena import ConstraintArena
+from antecedent_writer import AntecedentWriter
+
+class StepHandle:
+    """
+    A proof step admitted blind, kept as the byte span of its line in the
+    proof until the constraint is needed. Its type and antecedents are in the arena.
+    """
+    __slots__ = ("start", "end")
+
+    def __init__(self, start: int, end: int):
+        self.start = start
+        self.end = end
+
 
 class Model:
     """
     The class for the model.
     """
 
-    def __init__(self, filename, loud=False):
+    def __init__(self, filename, loud=False, memory_cap=None, binary_rup=False, rup_writer=None):
+        """
+        memory_cap: if given, the bytes of constraints and of the occurrence
+        index of the propagator kept in memory, half the cap each. The rest of
+        the constraints are spilled to disk and read back when needed, the rest
+        of the index is suspended
+        binary_rup: whether to write the antecedents in the binary format of `AntecedentWriter`
+        rup_writer: where to write the antecedents instead of the .rup file,
+        e.g. an `AntecedentRecorder` to keep them in memory
+        """
         name = filename.split('/')[-1].split('.')[0]
         self.loud = loud
-        self.logger = logging.getLogger('model_logging')
-        f_handler = logging.FileHandler('rup/stack_'+name+'.rup', mode='w')
-        f_handler.setLevel(logging.WARNING)
-        self.logger.addHandler(f_handler)
+        if rup_writer is None:
+            rup_writer = AntecedentWriter('rup/stack_'+name+'.rup', binary=binary_rup)
+        self.rup_writer = rup_writer
         self.filename = filename
-        self.model_constraint_db: Dict[int, Constraint] = {}
-        self.proof_constraint_db: Dict[int, Constraint] = {}
         self.expected_no_of_literals = 0
         self.expected_no_of_constraints = 0
         self.literal_id_map = {}
@@ -28,27 +52,100 @@ class Model:
         self.no_of_model_constraints = 0
         self.constraints_known_to_propagate = PrioritySet()
         self.dead_constraints = set()
+        budget = memory_cap // 2 if memory_cap is not None else None
+        self.propagator = Propagator(self.get_constraint, budget)
+        # model and proof constraints, or the handles of blind steps, indexed by id
+        self.arena = ConstraintArena(budget)
+        # wiped out constraints in the order of their time of death
+        self.deaths = deque()
+        # the proof the step handles point into, see `admit_blind_step`
+        self.reader = None
+        # the constraints below this id are watched unless they are wiped out
+        self.watched_up_to = 1
         self.parse()
 
     def get_constraint(self, id) -> Constraint:
         """
         id: the id of the constraint to be returned
         """
-        if id <= self.no_of_model_constraints:
-            return self.model_constraint_db[id]
+        constraint = self.arena.objects[id]
+        if type(constraint) is not Constraint:
+            if constraint is None:
+                # deleted, or spilled to disk under a memory cap
+                return self.arena.constraint(id)
+            constraint = self.materialise(id, constraint)
+        return constraint
+
+    def materialise(self, id: int, handle: StepHandle) -> Constraint:
+        """
+        Parses the line of a step admitted blind and replaces its handle with the constraint.
+        """
+        line = self.reader.line(handle.start, handle.end)
+        step_type = self.arena.type(id)
+        if step_type == "p":
+            constraint = self.pol_constraint(line)
+        elif step_type == "j":
+            constraint = self.j_constraint(line)
+        elif step_type == "u":
+            constraint = self.rup_constraint(line)
         else:
-            return self.proof_constraint_db[id]
+            constraint = self.v_constraint(line)
+        self.arena.store(id, constraint)
+        if self.loud:
+            print("    constraint " +"{:04d}".format(id) + " materialised: ", constraint)
+        return constraint
+
+    def antecedents(self, id: int) -> List[int]:
+        """
+        :return: the antecedents of a p or j step, without materialising it.
+        """
+        return self.arena.antecedents_of(id)
+
+    def step_type(self, id: int) -> str:
+        return self.arena.type(id)
+
+    def unwatch(self, id: int) -> None:
+        """
+        Stops propagating with the constraint, if it is watched. Under a
+        memory cap it is spilled right away, it is not needed until it is watched again.
+        """
+        if self.propagator.is_watched(id):
+            self.propagator.unwatch(id, self.get_constraint(id))
+            self.arena.evict(id)
+
+    def watch_below(self, id: int, dead: bytearray) -> None:
+        """
+        Watches the constraints below `id` that are not watched yet and not wiped out.
+        """
+        for i in range(self.watched_up_to, id):
+            if not dead[i] and not self.propagator.is_watched(i):
+                self.propagator.watch(i, self.get_constraint(i))
+        self.watched_up_to = max(self.watched_up_to, id)
 
     def delete_constraint(self, id: int) -> None:
         """
         id: the id of the constraint to be deleted
         """
-        if id <= self.no_of_model_constraints:
-            del self.model_constraint_db[id]
-        else:
-            del self.proof_constraint_db[id]
+        self.propagator.unwatch(id, self.get_constraint(id))
+        self.arena.delete(id)
         self.dead_constraints.add(id)
 
+    def wipe_out(self, first: int, last: int, time_of_death: int) -> None:
+        """
+        first, last: the ids of the first and last constraints wiped out
+        time_of_death: the first constraint id they are no longer alive for
+        """
+        self.deaths.append((first, last, time_of_death))
+
+    def bury_dead(self) -> None:
+        """
+        Stops propagating with the wiped out constraints that are no longer alive.
+        """
+        while self.deaths and self.deaths[0][2] < self.no_of_constraints:
+            first, last, _ = self.deaths.popleft()
+            for i in range(first, last+1):
+                self.unwatch(i)
+
     def add_constraint(self, constraint: Constraint, to_model=False) -> None:
         """
         :param: constraint: the constraint to be added
@@ -56,52 +153,41 @@ class Model:
         Adds the constraint to the model and updates
         the number of constraints
         """
-        self.no_of_constraints += 1
-        if to_model:
-            self.model_constraint_db[self.no_of_constraints] = constraint
-        else:
-            self.proof_constraint_db[self.no_of_constraints] = constraint
+        self.no_of_constraints = self.arena.add(constraint)
+        self.propagator.watch(self.no_of_constraints, constraint)
+        if self.watched_up_to == self.no_of_constraints:
+            self.watched_up_to += 1
         if self.loud:
             print("    constraint " +"{:04d}".format(self.no_of_constraints) + " added: ", constraint)
 
+    def admit_blind_step(self, type: str, start: int, end: int, antecedents: List[int]) -> None:
+        """
+        :param: type: the step type, one of p, u, j and v
+        :param: start, end: the byte span of the line in `self.reader`
+        :param: antecedents: the ids the line references
+        Admits the step without parsing it, its constraint is only built
+        and watched once the backward check needs it.
+        """
+        self.no_of_constraints = self.arena.add(StepHandle(start, end), type, antecedents)
+
     def constraint_parser(self, line: str) -> Constraint:
         """
         :param: line: the line to be parsed
         :return: the constraint object
         """
-        line = line[:-1].split(">=")
-        degree = int(line[1])
-        line = line[0].split()
-        coefficients = [int(line[i]) for i in range(0, len(line), 2)]
-        literals = [line[i] for i in range(1, len(line), 2)]
-        literal_ids = []
-        for i in literals:
-            temp = i if i[0] != "~" else i[1:]
-            if temp not in self.literal_id_map:
-                self.no_of_literals += 1
-                self.literal_id_map[temp] = self.no_of_literals
-            literal_ids.append(
-                self.literal_id_map[temp] if i[0] != "~" else -1*self.literal_id_map[temp])
-        if len(coefficients) != len(literal_ids):
-            raise Exception(
-                "unequal number of literals and coefficients")
-        temp = Constraint(literal_ids, coefficients, degree)
-        return temp
+        constraint = parse_constraint(line, self.literal_id_map)
+        self.no_of_literals = len(self.literal_id_map)
+        return constraint
 
     def parse(self) -> None:
         """
         Parses the model file and adds the constraints to the model
         """
-        with open(self.filename, mode="r", encoding="utf-8") as file:
-            for line in file:
-                line = line.strip()
-                if "#variable=" in line:
-                    temp = line.split()
-                    self.expected_no_of_literals = int(temp[2])
-                    self.expected_no_of_constraints = int(temp[4])
-                if not line.startswith("*") and len(line) > 0:
-                    temp = self.constraint_parser(line)
-                    self.add_constraint(temp, True)
+        self.expected_no_of_literals, self.expected_no_of_constraints, constraints = \
+            parse_opb(self.filename, self.literal_id_map)
+        self.no_of_literals = len(self.literal_id_map)
+        for constraint in constraints:
+            self.add_constraint(constraint, True)
         self.no_of_model_constraints = self.no_of_constraints
         # if self.expected_no_of_literals != self.no_of_literals:
         #     print("WARNING: NUMBER OF LITERALS IN MODEL FILE HEADER DOES NOT MATCH WITH THE NUMBER OF LITERALS IN THE FILE")
@@ -122,11 +208,8 @@ class Model:
         """
         Checks if the passed solution is a valid solution
         """
-        line = line.split()[1:]
-        assignment = [self.literal_id_map[i] if i[0] != "~" else -1 *
-                      self.literal_id_map[i[1:]] for i in line]
-        # print(assignment)
-        new_constraint = Constraint([-i for i in assignment], [1 for i in assignment], 1, type="v")
+        new_constraint = self.v_constraint(line)
+        assignment = [-i for i in new_constraint.literal_array]
         if self.loud:
             self.constraint_str(new_constraint)
         if not blind:
@@ -138,36 +221,49 @@ class Model:
                 raise Exception("INVALID SOLUTION CLAIMED")
         else:
             self.add_constraint(new_constraint)
-    def is_solution(self, constraint: Constraint, assignment: List[int] = []) -> bool:
+
+    def v_constraint(self, line: str) -> Constraint:
+        """
+        :return: the constraint excluding the solution of the v line.
+        """
+        line = line.split()[1:]
+        assignment = [self.literal_id_map[i] if i[0] != "~" else -1 *
+                      self.literal_id_map[i[1:]] for i in line]
+        return Constraint([-i for i in assignment], [1 for i in assignment], 1, type="v")
+
+    def is_solution(self, constraint: Constraint, assignment: Optional[List[int]] = None, last_id: int = None,
+                    dead: bytearray = None) -> bool:
+        """
+        Checks the assignment against the live constraints up to `last_id`,
+        so the clause excluding the solution is not part of its own check.
+        dead: flags of the constraints wiped out when checking backwards
+        """
+        if assignment is None:
+            assignment = []
         # print("yoyo", self.constraint_str(constraint))
-        tau = assignment
+        tau = Assignment(self.no_of_literals, assignment)
         # tau = constraint.propagate([])
         # if self.loud:
         # print("    ASSIGNMENT: ", tau)
         fired_constraints = []
-        check_core_first = sorted(copy.deepcopy(self.constraints_known_to_propagate.heap))
-        check_core_first = [-i for i in check_core_first]
+        live = self.live_up_to(last_id, dead)
+        if len(tau) == self.no_of_literals:
+            return self.is_total_solution(tau, live)
+        # the constraints known to propagate are tried first, latest first
+        live_ids = set(live)
+        order = [i for i in self.constraints_known_to_propagate if i in live_ids]
+        order += [i for i in live if i not in self.constraints_known_to_propagate]
+        matrix = SlackMatrix(order, self.get_constraint)
         while True:
             unit_propagated = False
-            for i in check_core_first:
-                if i not in self.dead_constraints:
-                    constraint = self.get_constraint(i)
-                    constraint_propagates = constraint.propagate(tau)
-                    if constraint_propagates != []:
-                        fired_constraints.append(i)
-                        tau += constraint_propagates
-                        unit_propagated = True
-                        break
-            if not unit_propagated:
-                for i in range(1, self.no_of_constraints+1):
-                    if i not in check_core_first and i not in self.dead_constraints:
-                        constraint = self.get_constraint(i)
-                        constraint_propagates = constraint.propagate(tau)
-                        if constraint_propagates != []:
-                            fired_constraints.append(i)
-                            tau += constraint_propagates
-                            unit_propagated = True
-                            break
+            for row in matrix.candidates(tau):
+                constraint_propagates = matrix.constraints[row].propagate(tau)
+                if constraint_propagates != []:
+                    fired_constraints.append(matrix.ids[row])
+                    for literal in constraint_propagates:
+                        tau.assign(literal)
+                    unit_propagated = True
+                    break
             if not unit_propagated:
                 # print(len(tau), self.no_of_literals)
                 if len(tau) != self.no_of_literals:
@@ -176,145 +272,77 @@ class Model:
                 else:
                     if self.loud:
                         print("    VALID SOLUTION FOUND")
-                    self.logger.warning(str(self.no_of_constraints)+":"+" ".join([str(i) for i in fired_constraints]))
+                    self.rup_writer.write(self.no_of_constraints, fired_constraints)
                     return True
 
+    def live_up_to(self, last_id: int = None, dead: bytearray = None) -> List[int]:
+        """
+        :return: the ids up to `last_id` that are neither deleted nor flagged in `dead`.
+        """
+        if last_id is None:
+            last_id = self.no_of_constraints
+        return [i for i in range(1, last_id+1)
+                if i not in self.dead_constraints and (dead is None or not dead[i])]
+
+    def is_total_solution(self, tau: Assignment, live: List[int]) -> bool:
+        """
+        Checks a total assignment in one pass over the `live` constraints,
+        nothing can propagate so no antecedents are needed.
+        """
+        if not SlackMatrix(live, self.get_constraint).is_satisfied(tau):
+            raise Exception("INVALID SOLUTION CLAIMED, CONSTRAINT FALSIFIED")
+        if self.loud:
+            print("    VALID SOLUTION FOUND")
+        self.rup_writer.write(self.no_of_constraints, [])
+        return True
+
     def admit_pol_step(self, statement: str, blind=False) -> None:
         """
         Processes the polish notation statement on the constraints
         and adds the new constraint to the model
         """
-        statement = statement.split(" ")[1:-1]
-        antecedents = []
-        stack = []
-        operations = ["+", "-", "*", "d"]
-        # print(statement)
-        if len(statement) == 1:
-            id = int(statement[0])
-            stack.append(id)
-        for i in range(len(statement)):
-            if statement[i] not in operations:
-                id = statement[i]
-                stack.append(id)
-            else:
-                temp = None
-                if statement[i] == '+':
-                    # print("ADDING CONSTRAINT")
-                    # print("STACK: ", stack)
-                    constraint_2 = stack.pop()
-                    if not isinstance(constraint_2, Constraint):
-                        # print(constraint_2, "CONSTRAINT 2 IS NOT A CONSTRAINT")
-                        if constraint_2.isdigit():
-                            # print(constraint_2)
-                            # print("CONSTRAINT 2 IS A DIGIT")
-                            antecedents.append(int(constraint_2))
-                            constraint_2 = self.get_constraint(int(constraint_2))
-                        else:
-                            # print("CONSTRAINT 2 IS A LITERAL")
-                            if constraint_2[0] == "~":
-                                constraint_2 = Constraint([-self.literal_id_map[constraint_2[1:]]], [1], 0)
-                            else:
-                                constraint_2 = Constraint([self.literal_id_map[constraint_2]], [1], 0)
-                    constraint_1 = stack.pop()
-                    if not isinstance(constraint_1, Constraint):
-                        if constraint_1.isdigit():
-                            antecedents.append(int(constraint_1))
-                            constraint_1 = self.get_constraint(int(constraint_1))
-                        else:
-                            if constraint_1[0] == "~":
-                                constraint_1 = Constraint([-self.literal_id_map[constraint_1[1:]]], [1], 0)
-                            else:
-                                constraint_1 = Constraint([self.literal_id_map[constraint_1]], [1], 0)
-                    temp = constraint_1 + constraint_2
-                    if self.loud:
-                        print("adding", constraint_1, constraint_2, temp)
-                elif statement[i] == '-':
-                    constraint_2 = stack.pop()
-                    if not isinstance(constraint_2, Constraint):
-                        if constraint_2.isdigit():
-                            constraint_2 = self.get_constraint(int(constraint_2))
-                        else:
-                            if constraint_2[0] == "~":
-                                constraint_2 = Constraint([-self.literal_id_map[constraint_2[1:]]], [1], 0)
-                            else:
-                                constraint_2 = Constraint([self.literal_id_map[constraint_2]], [1], 0)
-                    constraint_1 = stack.pop()
-                    if not isinstance(constraint_1, Constraint):
-                        if constraint_1.isdigit():
-                            constraint_1 = self.get_constraint(int(constraint_1))
-                        else:
-                            if constraint_1[0] == "~":
-                                constraint_1 = Constraint([-self.literal_id_map[constraint_1[1:]]], [1], 0)
-                            else:
-                                constraint_1 = Constraint([self.literal_id_map[constraint_1]], [1], 0)
-                    temp = constraint_1 - constraint_2
-                elif statement[i] == '*':
-                    constraint_2 = stack.pop()
-                    constraint_2 = int(constraint_2)
-                    constraint_1 = stack.pop()
-                    if not isinstance(constraint_1, Constraint):
-                        if constraint_1.isdigit():
-                            constraint_1 = self.get_constraint(int(constraint_1))
-                            antecedents.append(int(constraint_1))
-                        else:
-                            if constraint_1[0] == "~":
-                                constraint_1 = Constraint([-self.literal_id_map[constraint_1[1:]]], [1], 0)
-                            else:
-                                constraint_1 = Constraint([self.literal_id_map[constraint_1]], [1], 0)
-                    temp = constraint_1 * constraint_2
-                elif statement[i] == 'd':
-                    # print("DIVIDING CONSTRAINT")
-                    constraint_2 = stack.pop()
-                    constraint_2 = int(constraint_2)
-                    constraint_1 = stack.pop()
-                    if not isinstance(constraint_1, Constraint):
-                        if constraint_1.isdigit():
-                            constraint_1 = self.get_constraint(int(constraint_1))
-                            antecedents.append(int(constraint_1))
-                        else:
-                            if constraint_1[0] == "~":
-                                constraint_1 = Constraint([-self.literal_id_map[constraint_1[1:]]], [1], 0)
-                            else:
-                                constraint_1 = Constraint([self.literal_id_map[constraint_1]], [1], 0)
-                    temp = constraint_1 / constraint_2
-                    if self.loud:
-                        print("dividing", constraint_1, constraint_2, temp)
-                temp.antecedents = antecedents
-                # print(antecedents)
-                temp.type = "p"
-                # print("TEMP: ", temp)
-                constr = copy.deepcopy(temp)
-                stack.append(constr)
-                # print("STACK: ", stack)
+        constraint = self.pol_constraint(statement)
         if not blind:
-            self.logger.warning(
-                str(self.no_of_constraints)+":"+" ".join([str(i) for i in antecedents]))
-            self.add_constraint(stack.pop())
-        else:
-            temp = stack.pop()
-            constr : Constraint = copy.deepcopy(temp)
-            self.add_constraint(constr)        
+            self.rup_writer.write(self.no_of_constraints, constraint.antecedents)
+        self.add_constraint(constraint)
+
+    def pol_constraint(self, statement: str) -> Constraint:
+        """
+        :return: the constraint derived by the pol statement, with its antecedents.
+        """
+        instructions = compile_pol(statement, self.literal_id_map)
+        if self.loud:
+            print("    ", instructions)
+        constraint, antecedents = evaluate_pol(instructions, self.get_constraint)
+        constraint.antecedents = antecedents
+        constraint.type = "p"
+        return constraint
+
     def admit_j_step(self, line: str, blind=False) -> None:
         """
         Adds the implication constraint to the model
         """
-        _, antecedent, constraint_string = line[1:-1].split(" ", 2)
-        antecedents = [int(antecedent)]
-        constraint = self.constraint_parser(constraint_string)
-        constraint.antecedents = antecedents
-        constraint.type = "j"
+        constraint = self.j_constraint(line)
         if not blind:
             self.add_constraint(constraint)
-            self.logger.warning(
-                str(self.no_of_constraints)+":"+" ".join([str(i) for i in antecedents]))
+            self.rup_writer.write(self.no_of_constraints, constraint.antecedents)
         else:
             self.add_constraint(constraint)
+
+    def j_constraint(self, line: str) -> Constraint:
+        """
+        :return: the constraint implied by the j line, with its antecedent.
+        """
+        _, antecedent, constraint_string = line[1:-1].split(" ", 2)
+        constraint = self.constraint_parser(constraint_string)
+        constraint.antecedents = [int(antecedent)]
+        constraint.type = "j"
+        return constraint
     def admit_rup_step(self, line: str, blind) -> None:
         """
         If the constraint is redundant, then it is added to the model.
         """
-        constraint = self.constraint_parser(line[1:-1])
-        constraint.type = "u"
+        constraint = self.rup_constraint(line)
         if not blind:
             constraint.negation()
             if not self.rup(constraint):
@@ -328,6 +356,14 @@ class Model:
         else:
             self.add_constraint(constraint)
 
+    def rup_constraint(self, line: str) -> Constraint:
+        """
+        :return: the constraint claimed by the u line.
+        """
+        constraint = self.constraint_parser(line[1:-1])
+        constraint.type = "u"
+        return constraint
+
     def rup(self, rup_constraint: Constraint) -> bool:
         """
         Returns True if the constraint is redundant to the model.
@@ -335,73 +371,33 @@ class Model:
         """
         if self.loud:
             print("⭐", self.constraint_str(rup_constraint))
-        tau = rup_constraint.propagate([])
-        fired_constraints = []
+        self.bury_dead()
+        fired_constraints = self.propagator.refute(rup_constraint, self.constraints_known_to_propagate)
+        if fired_constraints is None:
+            return False
         if self.loud:
-            print("    ASSIGNMENT: ", tau)
-        check_core_first = sorted(copy.deepcopy(self.constraints_known_to_propagate.heap))
-        while True:
-            unit_propagated = False
-            for i in range(1, self.no_of_constraints+1):
-                if i not in self.dead_constraints:
-                    tod = self.get_constraint(i).time_of_death
-                    if tod < self.no_of_constraints and tod != -1:
-                        continue
-                    constraint = self.get_constraint(i)
-                    if constraint.is_unsatisfied(tau):
-                        fired_constraints.append(i)
-                        if self.loud:
-                            print("    FIRED CONSTRAINTS: ", fired_constraints)
-                        self.constraints_known_to_propagate.add(fired_constraints)
-                        self.logger.warning(
-                            str(self.no_of_constraints)+":"+" ".join([str(i) for i in fired_constraints]))
-                        return True
-            if rup_constraint.is_unsatisfied(tau):
-                if self.loud:
-                    print("    FIRED CONSTRAINTS: ", fired_constraints)
-                self.constraints_known_to_propagate.add(fired_constraints)
-                self.logger.warning(
-                    str(self.no_of_constraints)+":"+" ".join([str(i) for i in fired_constraints]))
-                return True
-            for i in reversed(check_core_first):
-                i = -i
-                if i not in self.dead_constraints:
-                    tod = self.get_constraint(i).time_of_death
-                    if tod < self.no_of_constraints and tod != -1:
-                        continue
-                    constraint = self.get_constraint(i)
-                    constraint_propagates = constraint.propagate(tau)
-                    if constraint_propagates != []:
-                        fired_constraints.append(i)
-                        tau += constraint_propagates
-                        unit_propagated = True
-                        break
-            if not unit_propagated:
-                for i in range(1, self.no_of_constraints+1):
-                    if i not in self.constraints_known_to_propagate.set and i not in self.dead_constraints:
-                        tod = self.get_constraint(i).time_of_death
-                        if tod < self.no_of_constraints and tod != -1:
-                            continue
-                        constraint = self.get_constraint(i)
-                        constraint_propagates = constraint.propagate(tau)
-                        if constraint_propagates != []:
-                            fired_constraints.append(i)
-                            tau += constraint_propagates
-                            unit_propagated = True
-                            break
-            if not unit_propagated:
-                return False
+            print("    FIRED CONSTRAINTS: ", fired_constraints)
+        self.constraints_known_to_propagate.add(fired_constraints)
+        self.rup_writer.write(self.no_of_constraints, fired_constraints)
+        return True
+
+    def close(self) -> None:
+        """
+        Writes out and closes the .rup file.
+        """
+        self.rup_writer.close()
+
     def constraint_str(self, constraint:Constraint) -> str:
         """
         Returns the string representation of the constraint
         """
         id_literal_map = {v: k for k, v in self.literal_id_map.items()}
         constraint_string = ""
-        for i in constraint.literals:
+        for i, coefficient in zip(constraint.literal_array, constraint.coefficient_array):
             if i < 0:
-                constraint_string += " "+ str(constraint.coefficients[abs(i)]) + " ~" + str(id_literal_map[abs(i)])
+                constraint_string += " "+ str(coefficient) + " ~" + str(id_literal_map[abs(i)])
             else:
-                constraint_string += " "+ str(constraint.coefficients[abs(i)]) + " " + str(id_literal_map[abs(i)])
+                constraint_string += " "+ str(coefficient) + " " + str(id_literal_map[abs(i)])
         constraint_string += " >= "
         constraint_string += str(constraint.degree)
         return constraint_string
@@ -423,24 +419,49 @@ class Model:
         """
         constraint_id = self.no_of_constraints
         self.constraints_known_to_propagate.add(self.no_of_constraints)
+        # wiped out constraints are propagated with again once checking
+        # gets back below their time of death
+        revive = defaultdict(list)
+        dead = bytearray(self.no_of_constraints + 1)
+        for first, last, time_of_death in self.deaths:
+            revive[time_of_death].append((first, last))
+            for i in range(first, last+1):
+                dead[i] = 1
+                self.unwatch(i)
+        self.deaths.clear()
+        revived_down_to = max([self.no_of_constraints] + list(revive)) + 1
+        unwatched_from = self.no_of_constraints + 1
         while self.constraints_known_to_propagate.empty() == False:
             constraint_id = self.constraints_known_to_propagate.pop()
             if constraint_id < self.no_of_model_constraints:
                 break
             # map(self.delete_constraint, range(constraint_id+1, old_constraint_id+1))
             self.no_of_constraints = constraint_id
-            constraint = self.get_constraint(constraint_id)
-            if constraint.type == "p":
-                antecedents = constraint.antecedents
-                self.constraints_known_to_propagate.add(antecedents)
-                self.logger.warning(str(constraint_id)+":"+" ".join([str(i) for i in antecedents]))
-            elif constraint.type == "j":
-                antecedents = constraint.antecedents
+            # the constraints are dead for the step at their time of death itself
+            for time_of_death in range(constraint_id + 1, revived_down_to):
+                for first, last in revive.pop(time_of_death, ()):
+                    dead[first:last+1] = bytes(last+1-first)
+                    # the constraints above watched_up_to are watched when the propagator needs them
+                    for i in range(first, min(last+1, constraint_id, self.watched_up_to)):
+                        self.propagator.watch(i, self.get_constraint(i))
+            revived_down_to = constraint_id + 1
+            for i in range(constraint_id, unwatched_from):
+                self.unwatch(i)
+            unwatched_from = constraint_id
+            self.watched_up_to = min(self.watched_up_to, constraint_id)
+            step_type = self.step_type(constraint_id)
+            if step_type == "p" or step_type == "j":
+                # blind steps are not materialised to follow their antecedents
+                antecedents = self.antecedents(constraint_id)
                 self.constraints_known_to_propagate.add(antecedents)
-                self.logger.warning(str(constraint_id)+":"+" ".join([str(i) for i in antecedents]))
-            elif constraint.type == "u":
+                self.rup_writer.write(constraint_id, antecedents)
+            elif step_type == "u":
+                self.watch_below(constraint_id, dead)
+                constraint = self.get_constraint(constraint_id)
                 constraint.negation()
                 self.rup(constraint)
-            elif constraint.type == "v":
-                self.is_solution(constraint, assignment=[-i for i in constraint.literals])
-            # print(constraint_id, len(self.constraints_known_to_propagate.heap))
\ No newline at end of file
+            elif step_type == "v":
+                constraint = self.get_constraint(constraint_id)
+                self.is_solution(constraint, assignment=[-i for i in constraint.literal_array], last_id=constraint_id-1,
+                                 dead=dead)
+            # print(constraint_id, len(self.constraints_known_to_propagate))
\ No newline at end of file
@@ -1,81 +1,95 @@
 from stack_model import Model
 from collections import defaultdict
-import logging
+from itertools import chain
+from proof_reader import ProofReader
+from step_index import StepIndex
+
+STEP_NAMES = {'p': "POL STEP: ", 'u': "RUP STEP: ", 'j': "J STEP: ", 'v': "V STEP: "}
+
+
 # pylint: disable=R0903
 class Proof:
     """
     Class to parse a proof file and admit the steps to the model
     """
 
-    def __init__(self, file, loud=False, backwards=False):
+    def __init__(self, file, loud=False, backwards=False, memory_cap=None, binary_rup=False, rup_writer=None):
+        """
+        memory_cap: if given, the bytes of constraints and of their index the model keeps in memory
+        binary_rup: whether to write the .rup file in the binary format
+        rup_writer: where the model writes the antecedents instead of the .rup file
+        """
         self.proof_file = file + '.veripb'
-        self.model = Model(file + '.opb', loud=loud)
+        self.model = Model(file + '.opb', loud=loud, memory_cap=memory_cap, binary_rup=binary_rup,
+                           rup_writer=rup_writer)
         self.no_of_formulas = self.model.no_of_constraints
         self.loud = loud
         self.backwards = backwards
-        self.parse()
+        try:
+            self.parse()
+        finally:
+            self.model.close()
 
     def parse(self):
         """
         Parses the proof file and admits the steps to the model
         """
-        wipeout = defaultdict(set)
+        # the constraints derived at each level, as runs [first, last] of ids
+        wipeout = defaultdict(list)
         active_level = 0
-        with open(self.proof_file, mode="r", encoding="utf-8") as file:
-            for line in file:
-                if line[0] == '*':
-                    if self.loud:
-                        print("COMMENT: ", line[:-1])
-                if line[0] == '#':
-                    line = line[1:].split()
-                    lvl = int(line[0])
-                    wipeout[lvl]
-                    active_level = lvl
-                    if self.loud:
-                        print("LEVEL SET: ", lvl)
-                elif line.startswith("pseudo"):
-                    if self.loud:
-                        print("FILE TYPE: ", line)
-                elif line[0] == 'f':
-                    if self.loud:
-                        print("FORMULA CHECK: ", line)
-                    file = int(line.split()[1])
-                    if isinstance(file, int):
-                        if file != self.no_of_formulas:
-                            raise ValueError("Number of formulas mismatch")
-                elif line[0] == 'p':
-                    if self.loud:
-                        print("POL STEP: ", line[:-1])
-                    self.model.admit_pol_step(line, blind=self.backwards)
-                    wipeout[active_level].add(self.model.no_of_constraints)
-                elif line[0] == 'u':
+        index = StepIndex.open(self.proof_file)
+        # the steps up to each event are admitted before it, the sentinel admits the rest
+        events = chain(index.iter_events(), [(len(index), None, 0)])
+        admitted = 0
+        with ProofReader(self.proof_file) as reader:
+            self.model.reader = reader
+            for steps_before, event, value in events:
+                for step in range(admitted, steps_before):
+                    kind = chr(index.types[step])
+                    start, end = index.starts[step], index.ends[step]
                     if self.loud:
-                        print("RUP STEP: ", line[:-1])
-                    self.model.admit_rup_step(line, blind=self.backwards)
-                elif line[0] == 'j':
+                        print(STEP_NAMES[kind], reader.line(start, end)[:-1])
+                    if self.backwards:
+                        # the line is only parsed if the backward check needs its constraint
+                        self.model.admit_blind_step(kind, start, end,
+                                                    index.antecedents(index.no_of_formulas + 1 + step))
+                    elif kind == 'p':
+                        self.model.admit_pol_step(reader.line(start, end))
+                    elif kind == 'u':
+                        self.model.admit_rup_step(reader.line(start, end), blind=False)
+                    elif kind == 'j':
+                        self.model.admit_j_step(reader.line(start, end))
+                    else:
+                        self.model.admit_v_step(reader.line(start, end))
+                    if kind == 'p':
+                        runs = wipeout[active_level]
+                        if runs and runs[-1][1] == self.model.no_of_constraints - 1:
+                            runs[-1][1] = self.model.no_of_constraints
+                        else:
+                            runs.append([self.model.no_of_constraints, self.model.no_of_constraints])
+                admitted = steps_before
+                if event == '#':
+                    wipeout[value]
+                    active_level = value
                     if self.loud:
-                        print("J STEP: ", line[:-1])
-                    self.model.admit_j_step(line, blind=self.backwards)
-                elif line[0] == 'v':
+                        print("LEVEL SET: ", value)
+                elif event == 'f':
                     if self.loud:
-                        print("V STEP: ", line[:-1])
-                    self.model.admit_v_step(line, blind=self.backwards)
-                elif line[0] == 'c':
-                    self.model.admit_check_contradiction(line)
-                elif line[0] == 'w':
-                    lvl = int(line.split()[1])
-                    to_delete = set()
+                        print("FORMULA CHECK: ", value)
+                    if value != self.no_of_formulas:
+                        raise ValueError("Number of formulas mismatch")
+                elif event == 'c' and self.loud:
+                    # the check only reports, blind steps are not materialised for it otherwise
+                    self.model.admit_check_contradiction("c " + str(value))
+                elif event == 'w':
                     if self.loud:
-                        print("WIPING OUT LEVELS: ", lvl)
+                        print("WIPING OUT LEVELS: ", value)
                     for i in wipeout.keys():
-                        if i >= lvl:
-                            to_delete |= wipeout[i]
-                            wipeout[i] = set()
-                    for i in to_delete:
-                        # print(i, self.model.get_constraint(i), type(self.model.get_constraint(i)))
-                        self.model.get_constraint(i).time_of_death = self.model.no_of_constraints + 1
-        self.model.check_backwards()
-        logging.shutdown()
+                        if i >= value:
+                            for first, last in wipeout[i]:
+                                self.model.wipe_out(first, last, self.model.no_of_constraints + 1)
+                            wipeout[i] = []
+            self.model.check_backwards()
         # print("Proof parsed successfully")
 
 
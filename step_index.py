@@ -0,0 +1,164 @@
+"""
+Step Index
+Index of the steps of a proof file, built in one streaming pass and kept
+on disk next to the proof, so the backward checker can seek to any step.
+"""
+
+from typing import Iterator, List, Tuple
+from array import array
+import os
+import struct
+from proof_reader import ProofReader
+from pol import referenced_ids
+
+MAGIC = b"SMOLIDX1"
+# magic, size and mtime of the proof, formulas, steps, references, events
+HEADER = struct.Struct("=8s6q")
+# the step types that derive a constraint
+STEPS = b"pujv"
+# the other statements that matter to the checker, kept as events
+EVENTS = b"#wcf"
+
+
+class StepIndex:
+    """
+    For every derived step, its byte span in the proof, its type and the
+    ids it references explicitly (the antecedents of p and j steps). The
+    other statements (levels, wipe outs, the contradiction and the formula
+    count) are kept as events (steps before it, type, value) in file order.
+    """
+    def __init__(self):
+        self.source = (0, 0)
+        self.no_of_formulas = 0
+        self.starts = array("q")
+        self.ends = array("q")
+        self.types = bytearray()
+        self.indptr = array("q", [0])
+        self.references = array("q")
+        self.events = array("q")
+
+    @classmethod
+    def open(cls, proof_file: str, index_file: str = None) -> 'StepIndex':
+        """
+        :param: proof_file: the .veripb file
+        :param: index_file: where the index is kept, defaults to the proof file with .idx appended
+        :return: the index saved for the proof if it is still up to date,
+            else a freshly built one, which is saved for the next run.
+        """
+        if index_file is None:
+            index_file = proof_file + ".idx"
+        stat = os.stat(proof_file)
+        source = (stat.st_size, stat.st_mtime_ns)
+        try:
+            index = cls.load(index_file)
+            if index.source == source:
+                return index
+        except (OSError, ValueError):
+            pass
+        index = cls.build(proof_file)
+        index.source = source
+        try:
+            index.save(index_file)
+        except OSError:
+            # the index is only a cache, a read only directory is fine
+            pass
+        return index
+
+    @classmethod
+    def build(cls, proof_file: str) -> 'StepIndex':
+        """
+        :return: the index of the proof, built in one pass over the file.
+        """
+        index = cls()
+        with ProofReader(proof_file) as reader:
+            for step, start, end in reader:
+                code = ord(step)
+                if code in STEPS and not reader.startswith(b"pseudo", start):
+                    index.starts.append(start)
+                    index.ends.append(end)
+                    index.types.append(code)
+                    if step == "p":
+                        index.references.extend(referenced_ids(reader.line(start, end)))
+                    elif step == "j":
+                        index.references.append(int(reader.line(start, end).split(None, 2)[1]))
+                    index.indptr.append(len(index.references))
+                elif code in EVENTS:
+                    line = reader.line(start, end)
+                    value = int(line[1:].split()[0] if step == "#" else line.split()[1])
+                    if step == "f":
+                        index.no_of_formulas = value
+                    index.events.extend((len(index.types), code, value))
+        return index
+
+    def save(self, index_file: str) -> None:
+        """
+        Writes the index in native byte order, it is only read back on the same machine.
+        """
+        with open(index_file, mode="wb") as file:
+            file.write(HEADER.pack(MAGIC, self.source[0], self.source[1], self.no_of_formulas,
+                                   len(self.types), len(self.references), len(self.events)))
+            file.write(self.starts.tobytes())
+            file.write(self.ends.tobytes())
+            file.write(self.types)
+            file.write(self.indptr.tobytes())
+            file.write(self.references.tobytes())
+            file.write(self.events.tobytes())
+
+    @classmethod
+    def load(cls, index_file: str) -> 'StepIndex':
+        """
+        :raises ValueError: if the file is not a complete index.
+        """
+        index = cls()
+        with open(index_file, mode="rb") as file:
+            data = file.read()
+        if len(data) < HEADER.size:
+            raise ValueError("Truncated step index: " + index_file)
+        magic, size, mtime, index.no_of_formulas, steps, references, events = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a step index: " + index_file)
+        index.source = (size, mtime)
+        width = index.starts.itemsize
+        offset = HEADER.size
+        sections = []
+        for length in (steps * width, steps * width, steps, (steps + 1) * width,
+                       references * width, events * width):
+            sections.append(data[offset:offset + length])
+            offset += length
+        if offset != len(data):
+            raise ValueError("Truncated step index: " + index_file)
+        index.starts = array("q", sections[0])
+        index.ends = array("q", sections[1])
+        index.types = bytearray(sections[2])
+        index.indptr = array("q", sections[3])
+        index.references = array("q", sections[4])
+        index.events = array("q", sections[5])
+        return index
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def span(self, id: int) -> Tuple[int, int]:
+        """
+        :return: the byte span of the line deriving constraint `id`.
+        """
+        step = id - self.no_of_formulas - 1
+        return self.starts[step], self.ends[step]
+
+    def type(self, id: int) -> str:
+        return chr(self.types[id - self.no_of_formulas - 1])
+
+    def antecedents(self, id: int) -> List[int]:
+        """
+        :return: the ids referenced by the line deriving constraint `id`.
+        """
+        step = id - self.no_of_formulas - 1
+        return self.references[self.indptr[step]:self.indptr[step + 1]].tolist()
+
+    def iter_events(self) -> Iterator[Tuple[int, str, int]]:
+        """
+        Yields the events as (steps before it, type, value) in file order.
+        """
+        events = self.events
+        for i in range(0, len(events), 3):
+            yield events[i], chr(events[i + 1]), events[i + 2]
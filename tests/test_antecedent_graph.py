@@ -0,0 +1,35 @@
+from ..antecedent_graph import AntecedentGraph, convert, core_ids, last_uses, load_graph, reachable
+
+
+class TestAntecedentGraph:
+    def test_from_dict(self):
+        graph = AntecedentGraph.from_dict({4: [1, 2], 6: [4, 3]}, {4: "p", 6: "u"})
+        assert (graph.first, graph.last) == (4, 6)
+        assert graph.antecedents_of(4) == [1, 2]
+        assert graph.antecedents_of(5) == []
+        assert graph.antecedents_of(6) == [4, 3]
+        assert graph.type(6) == "u" and graph.type(5) is None
+
+    def test_convert(self, tmp_path):
+        rup_file = str(tmp_path / "proof.rup")
+        graph_file = str(tmp_path / "proof.csr")
+        with open(rup_file, "w") as file:
+            file.write("4:1 2\n6:\n5:4 3\n")
+        convert(rup_file, graph_file)
+        with load_graph(graph_file) as graph:
+            assert graph.data is not None
+            assert (graph.first, graph.last) == (4, 6)
+            assert [graph.antecedents_of(i) for i in range(4, 7)] == [[1, 2], [4, 3], []]
+            assert graph.types is None
+        assert load_graph(rup_file).antecedents_of(5) == [4, 3]
+
+    def test_core(self):
+        graph = AntecedentGraph.from_dict({4: [1, 2], 5: [3], 6: [4, 2]})
+        assert core_ids(graph).tolist() == [1, 2, 4, 6]
+        assert core_ids(graph, 5).tolist() == [3, 5]
+        assert reachable(graph)[5] == 0
+
+    def test_last_uses(self):
+        graph = AntecedentGraph.from_dict({4: [1, 2], 5: [3], 6: [4, 2], 7: [6, 4]})
+        uses = last_uses(graph, reachable(graph))
+        assert uses.tolist() == [0, 4, 6, 0, 7, 0, 7, 0]
@@ -0,0 +1,21 @@
+from ..antecedent_writer import AntecedentWriter, read_antecedents
+
+
+class TestAntecedentWriter:
+    def write(self, filename, binary):
+        with AntecedentWriter(filename, binary=binary) as writer:
+            writer.write(5, [1, 2])
+            writer.write(6, [])
+            writer.write(5, [3])
+
+    def test_text(self, tmp_path):
+        filename = str(tmp_path / "proof.rup")
+        self.write(filename, False)
+        with open(filename) as file:
+            assert file.read() == "5:1 2\n6:\n5:3\n"
+        assert read_antecedents(filename) == {5: [3], 6: []}
+
+    def test_binary(self, tmp_path):
+        filename = str(tmp_path / "proof.rup")
+        self.write(filename, True)
+        assert read_antecedents(filename) == {5: [3], 6: []}
@@ -0,0 +1,34 @@
+from ..assignment import Assignment
+from ..constraint import Constraint
+
+
+class TestAssignment:
+    def test_assign_and_lookup(self):
+        a = Assignment(3, [1, -3])
+        assert 1 in a
+        assert -3 in a
+        assert -1 not in a
+        assert 3 not in a
+        assert a.is_unassigned(2)
+        assert list(a) == [1, -3]
+
+    def test_grow_keeps_values(self):
+        a = Assignment(2, [-2, 1])
+        a.assign(-7)
+        assert a.no_of_variables >= 7
+        assert -2 in a and 1 in a and -7 in a
+        assert 2 not in a and 7 not in a
+
+    def test_backtrack(self):
+        a = Assignment(4, [1, 2, -3])
+        a.backtrack(1)
+        assert list(a) == [1]
+        assert 2 not in a and -3 not in a
+
+    def test_constraint_evaluation_matches_list(self):
+        c = Constraint([1, -2, 3, 4], [1, 2, 3, 4], 6)
+        for literals in ([], [2], [2, -4], [-1, 2, -3]):
+            a = Assignment(4, literals)
+            assert c.slack(a) == c.slack(literals)
+            assert sorted(c.propagate(a)) == sorted(c.propagate(literals))
+            assert c.is_unsatisfied(a) == c.is_unsatisfied(literals)
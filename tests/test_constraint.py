@@ -1,4 +1,4 @@
-from ..constraint import Constraint
+from ..constraint import Constraint, LinearCombination
 
 
 class TestConstraint:
@@ -52,4 +52,18 @@ class TestConstraint:
         c1 = Constraint([1, 2, 3], [1, 2, 3], 5)
         c2 = Constraint([1, 2, 3], [1, 1, 2], 3)
         assert c1 / 2 == c2
-    
\ No newline at end of file
+    
+    def test_linear_combination(self):
+        c1 = Constraint([1, -2, 3], [3, 5, 2], 6)
+        c2 = Constraint([2, 3], [1, 1], 1)
+        combination = LinearCombination(c1).add(c2, 2).add_literal(-3).divide(3)
+        assert combination.to_constraint() == Constraint([1, -2, 3], [1, 1, 1], 2)
+        assert c1 == Constraint([1, -2, 3], [3, 5, 2], 6)
+
+    def test_implies(self):
+        c1 = Constraint([1, 2], [1, 1], 1)
+        assert c1.implies(Constraint([1, 2, 3], [1, 1, 1], 1))
+        assert not c1.implies(Constraint([1, 3], [1, 1], 1))
+        c2 = Constraint([1, 2, 3], [2, 1, 1], 3)
+        assert c2.implies(Constraint([1, 2], [1, 1], 1))
+        assert not c2.implies(Constraint([1, 2], [1, 1], 2))
@@ -0,0 +1,84 @@
+import tracemalloc
+from ..constraint import Constraint
+from ..constraint_arena import ConstraintArena
+
+
+class TestConstraintArena:
+    def arena(self):
+        arena = ConstraintArena()
+        arena.add(Constraint([1, -2], [2, 1], 2))
+        arena.add(Constraint([2, 3], [1, 1], 1, type="p", antecedents=[1]))
+        arena.add(Constraint([1], [2 ** 70], 1))
+        return arena
+
+    def test_rows(self):
+        arena = self.arena()
+        assert len(arena) == 3
+        assert list(arena.terms(2)[0]) == [2, 3]
+        assert arena.type(2) == "p" and arena.antecedents_of(2) == [1]
+        arena.delete(1)
+        assert list(arena.live_ids()) == [2, 3]
+        assert arena.objects[1] is None
+
+    def test_save_and_open(self, tmp_path):
+        filename = str(tmp_path / "constraints.arena")
+        self.arena().save(filename)
+        arena = ConstraintArena.open(filename)
+        try:
+            assert arena.constraint(1) == Constraint([1, -2], [2, 1], 2)
+            assert arena.constraint(2).antecedents == [1]
+            assert arena.type(2) == "p"
+            try:
+                arena.constraint(3)
+                assert False, "wide rows are not saved"
+            except KeyError:
+                pass
+        finally:
+            arena.close()
+
+    def test_memory_cap(self, tmp_path):
+        arena = ConstraintArena(memory_cap=500)
+        constraints = [Constraint([1, -2, i + 3], [2, 1, i + 1], 2) for i in range(10)]
+        for constraint in constraints:
+            arena.add(constraint)
+        assert arena.objects[1] is None and arena.objects[10] is not None
+        assert arena.resident_bytes <= 500
+        assert [arena.constraint(i + 1) for i in range(10)] == constraints
+        arena.evict(10)
+        assert arena.objects[10] is None
+        filename = str(tmp_path / "constraints.arena")
+        arena.save(filename)
+        arena.close()
+        arena = ConstraintArena.open(filename)
+        try:
+            assert arena.constraint(4) == constraints[3]
+        finally:
+            arena.close()
+
+    def test_memory_cap_wide(self):
+        arena = ConstraintArena(memory_cap=500)
+        wide = Constraint([1, 2], [2 ** 70, 1], 2 ** 70)
+        id = arena.add(wide)
+        assert arena.resident_bytes > 0
+        arena.evict(id)
+        assert arena.objects[id] is None and arena.resident_bytes == 0
+        assert arena.constraint(id) == wide
+        arena.close()
+
+    def test_no_copy_without_cap(self):
+        constraints = [Constraint(range(1, 51), range(1, 51), 10) for _ in range(200)]
+        tracemalloc.start()
+        try:
+            start = tracemalloc.get_traced_memory()[0]
+            plain = [None]
+            plain.extend(constraints)
+            plain_bytes = tracemalloc.get_traced_memory()[0] - start
+            start = tracemalloc.get_traced_memory()[0]
+            arena = ConstraintArena()
+            for constraint in constraints:
+                arena.add(constraint)
+            arena_bytes = tracemalloc.get_traced_memory()[0] - start
+        finally:
+            tracemalloc.stop()
+        # a few columns of 8 bytes per row on top of the list, not the 50 terms of each constraint
+        assert arena_bytes < plain_bytes + 100 * len(constraints)
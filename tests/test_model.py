@@ -0,0 +1,45 @@
+from ..antecedent_writer import AntecedentRecorder
+from ..constraint import Constraint
+from ..model import Model
+from ..opb_parser import parse_constraint
+from ..stack_model import Model as StackModel
+
+
+class TestModel:
+    def test_hinted_rup(self, tmp_path):
+        opb_file = tmp_path / "hinted.opb"
+        opb_file.write_text("* #variable= 3 #constraint= 3\n1 x1 >= 1 ;\n1 ~x1 1 x2 >= 1 ;\n1 x3 >= 1 ;\n")
+        model = Model(str(opb_file), rup_writer=AntecedentRecorder())
+        negated = Constraint([-model.literal_id_map["x2"]], [1], 1)
+        assert model.hinted_rup(negated, [3, 1, 2]) == [1, 2]
+        assert model.hinted_rup(negated, [3, 1]) is None
+
+    def test_stack_solution_skips_wiped_out(self, tmp_path):
+        opb_file = tmp_path / "solution.opb"
+        opb_file.write_text("* #variable= 2 #constraint= 1\n1 x1 1 x2 >= 0 ;\n")
+        recorder = AntecedentRecorder()
+        model = StackModel(str(opb_file), rup_writer=recorder)
+        for text in ["1 x2 >= 1 ;", "1 ~x2 >= 1 ;", "1 ~x1 1 x2 >= 1 ;"]:
+            model.add_constraint(parse_constraint(text, model.literal_id_map))
+        dead = bytearray(5)
+        dead[2] = 1
+        assert model.is_solution(None, assignment=[model.literal_id_map["x1"]], last_id=3, dead=dead)
+        assert recorder.graph[model.no_of_constraints] == [3]
+
+    def test_memory_cap(self, tmp_path):
+        # x1 and a chain of implications x_i -> x_i+1 padded with 20 literals each
+        padding = " ".join("1 p%d" % j for j in range(20))
+        lines = ["* #variable= 221 #constraint= 201", "1 x1 >= 1 ;"]
+        lines += ["30 ~x%d 30 x%d %s >= 30 ;" % (i, i + 1, padding) for i in range(1, 201)]
+        opb_file = tmp_path / "chain.opb"
+        opb_file.write_text("\n".join(lines) + "\n")
+        cap = 60000
+        recorder = AntecedentRecorder()
+        model = Model(str(opb_file), memory_cap=cap, rup_writer=recorder)
+        assert model.propagator.no_of_suspended > 0
+        assert model.arena.resident_bytes + model.propagator.index_bytes() <= cap
+        negated = Constraint([model.literal_id_map["x201"]], [1], 1)
+        negated.negation()
+        assert model.rup(negated)
+        assert sorted(recorder.graph[model.no_of_constraints + 1]) == list(range(1, 202))
+        assert model.arena.resident_bytes + model.propagator.index_bytes() <= cap
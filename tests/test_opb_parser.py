@@ -0,0 +1,22 @@
+from ..constraint import Constraint
+from ..opb_parser import parse_constraint, parse_opb
+
+
+class TestOpbParser:
+    def test_parse_constraint(self):
+        literal_id_map = {"y": 1}
+        c = parse_constraint("+2 x -1 ~y 3 z 1 x >= 2 ;", literal_id_map)
+        assert literal_id_map == {"y": 1, "x": 2, "z": 3}
+        assert c == Constraint([2, -1, 3], [3, -1, 3], 2)
+        assert list(c.literal_array) == [1, 2, 3]
+
+    def test_parse_opb(self, tmp_path):
+        opb_file = tmp_path / "model.opb"
+        opb_file.write_text("* #variable= 3 #constraint= 2\n1 x1 1 ~x2 >= 1 ;\n  2 x3 1 x1 >= 2 ;\n")
+        literal_id_map = {}
+        header_literals, header_constraints, constraints = parse_opb(str(opb_file), literal_id_map)
+        assert (header_literals, header_constraints) == (3, 2)
+        assert literal_id_map == {"x1": 1, "x2": 2, "x3": 3}
+        assert constraints[1] == Constraint([3, 1], [2, 1], 2)
+        # every model gets its own constraints, they are negated in place
+        assert parse_opb(str(opb_file), {})[2][0] is not constraints[0]
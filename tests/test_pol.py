@@ -0,0 +1,34 @@
+from ..constraint import Constraint
+from ..pol import compile_pol, evaluate_pol, referenced_ids, CONSTRAINT, LITERAL, ADD, MULTIPLY, DIVIDE
+
+
+class TestPol:
+    constraints = {
+        1: Constraint([1, -2, 3], [3, 5, 2], 6),
+        2: Constraint([2, 3], [1, 1], 1),
+        3: Constraint([1, -2], [5, 4], 2),
+    }
+    literal_id_map = {"x1": 1, "x2": 2, "x3": 3}
+
+    def test_compile(self):
+        instructions = compile_pol("p 1 2 2 * + ~x3 + 3 d 0", self.literal_id_map)
+        assert instructions == [(CONSTRAINT, 1), (CONSTRAINT, 2), (MULTIPLY, 2), (ADD, 0),
+                                (LITERAL, -3), (ADD, 0), (DIVIDE, 3)]
+        # version 1.2 statements have no terminating 0
+        assert compile_pol("p 1 2 2 * + ~x3 + 3 d", self.literal_id_map) == instructions
+
+    def test_evaluate(self):
+        instructions = compile_pol("p 1 2 2 * + ~x3 + 3 d", self.literal_id_map)
+        constraint, antecedents = evaluate_pol(instructions, self.constraints.get)
+        assert constraint == Constraint([1, -2, 3], [1, 1, 1], 2)
+        assert antecedents == [1, 2]
+        assert self.constraints[1] == Constraint([1, -2, 3], [3, 5, 2], 6)
+
+    def test_saturate(self):
+        instructions = compile_pol("p 3 s", self.literal_id_map)
+        constraint, _ = evaluate_pol(instructions, self.constraints.get)
+        assert constraint == Constraint([1, -2], [2, 2], 2)
+
+    def test_referenced_ids(self):
+        assert referenced_ids("p 1 2 2 * + ~x3 + 3 d 0") == [1, 2]
+        assert referenced_ids("p 10 20 + 3 d") == [10, 20]
@@ -0,0 +1,14 @@
+from ..priority_set import PrioritySet
+
+
+class TestPrioritySet:
+    def test_pop_largest_first(self):
+        s = PrioritySet()
+        s.add([3, 17, 3, 9])
+        s.add(40)
+        assert len(s) == 4 and 17 in s and 4 not in s and 1000 not in s
+        assert list(s) == [40, 17, 9, 3]
+        assert s.pop() == 40
+        s.add([12, 1])
+        assert [s.pop() for _ in range(len(s))] == [17, 12, 9, 3, 1]
+        assert s.empty()
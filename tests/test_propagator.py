@@ -0,0 +1,79 @@
+import random
+from ..constraint import Constraint
+from ..assignment import Assignment
+from ..propagator import Propagator
+
+
+def refutes(constraints, negated, no_of_variables):
+    """
+    Naive unit propagation over the constraints and the negated one until a conflict or a fixpoint.
+    """
+    tau = Assignment(no_of_variables)
+    changed = True
+    while changed:
+        changed = False
+        for constraint in [negated] + constraints:
+            if constraint.slack(tau) < 0:
+                return True
+            for literal in constraint.propagate(tau):
+                tau.assign(literal)
+                changed = True
+    return False
+
+
+def random_constraint(generator, no_of_variables):
+    variables = generator.sample(range(1, no_of_variables + 1), generator.randint(1, 4))
+    literals = [variable * generator.choice([1, -1]) for variable in variables]
+    coefficients = [generator.randint(1, 3) for _ in literals]
+    return Constraint(literals, coefficients, generator.randint(1, sum(coefficients)))
+
+
+class TestPropagator:
+    def test_refute_matches_naive_propagation(self):
+        generator = random.Random(7)
+        no_of_variables = 6
+        for _ in range(200):
+            constraints = {}
+            propagator = Propagator(constraints.__getitem__)
+            for id in range(1, generator.randint(2, 12)):
+                constraints[id] = random_constraint(generator, no_of_variables)
+                propagator.watch(id, constraints[id])
+            deleted = set(generator.sample(sorted(constraints), generator.randint(0, len(constraints) // 2)))
+            for id in deleted:
+                propagator.unwatch(id, constraints[id])
+            live = [constraints[id] for id in sorted(constraints) if id not in deleted]
+            for _ in range(3):
+                negated = random_constraint(generator, no_of_variables)
+                antecedents = propagator.refute(negated)
+                assert (antecedents is not None) == refutes(live, negated, no_of_variables)
+                if antecedents is not None:
+                    assert not deleted.intersection(antecedents)
+                    assert refutes([constraints[id] for id in antecedents], negated, no_of_variables)
+
+    def test_unwatch_unit_rebuilds_root(self):
+        constraints = {1: Constraint([1], [1], 1), 2: Constraint([-1, 2], [1, 1], 1)}
+        propagator = Propagator(constraints.__getitem__)
+        for id, constraint in constraints.items():
+            propagator.watch(id, constraint)
+        not_x2 = Constraint([-2], [1], 1)
+        assert propagator.refute(not_x2) == [1, 2]
+        assert propagator.trail[:propagator.root_trail_length] == [1, 2]
+        propagator.unwatch(1, constraints[1])
+        assert propagator.refute(not_x2) is None
+        assert propagator.root_trail_length == 0
+
+    def test_suspension_under_budget(self):
+        # x1 and a chain x_i -> x_i+1, too big for the budget
+        constraints = {1: Constraint([1], [1], 1)}
+        constraints.update({i: Constraint([-(i - 1), i], [1, 1], 1) for i in range(2, 41)})
+        propagator = Propagator(constraints.__getitem__, memory_budget=2000)
+        for id, constraint in constraints.items():
+            propagator.watch(id, constraint)
+        assert propagator.no_of_suspended > 0
+        assert propagator.index_bytes() <= 2000
+        negated = Constraint([-40], [1], 1)
+        antecedents = propagator.refute(negated)
+        assert sorted(antecedents) == list(range(1, 41))
+        assert refutes([constraints[id] for id in antecedents], negated, 40)
+        assert propagator.refute(Constraint([40], [1], 1)) is None
+        assert propagator.index_bytes() <= 2000
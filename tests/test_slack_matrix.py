@@ -0,0 +1,24 @@
+from ..constraint import Constraint
+from ..assignment import Assignment
+from ..slack_matrix import SlackMatrix
+
+
+class TestSlackMatrix:
+    constraints = {
+        1: Constraint([1, -2, 3], [3, 5, 2], 6),
+        2: Constraint([2, 3], [1, 1], 1),
+        3: Constraint([], [], 0),
+        4: Constraint([-1, 4], [2, 1], 2),
+    }
+
+    def test_numpy_matches_python(self):
+        numpy_matrix = SlackMatrix([4, 3, 2, 1], self.constraints.get)
+        python_matrix = SlackMatrix([4, 3, 2, 1], self.constraints.get, use_numpy=False)
+        for literals in ([], [1], [1, 2], [-3, 2], [1, 2, -3, -4]):
+            tau = Assignment(4, literals)
+            assert list(numpy_matrix.slacks(tau)) == [self.constraints[i].slack(tau) for i in [4, 3, 2, 1]]
+            assert list(python_matrix.slacks(tau)) == [self.constraints[i].slack(tau) for i in [4, 3, 2, 1]]
+            propagating = [row for row, constraint in enumerate(numpy_matrix.constraints)
+                           if constraint.propagate(tau) != [] or constraint.is_unsatisfied(tau)]
+            assert numpy_matrix.candidates(tau) == propagating
+            assert set(propagating) <= set(python_matrix.candidates(tau))
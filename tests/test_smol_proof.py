@@ -0,0 +1,91 @@
+import pytest
+from array import array
+from ..antecedent_graph import AntecedentGraph, reachable
+from ..antecedent_writer import AntecedentRecorder
+from ..proof import Proof
+from ..smol_proof import proof_version, renumber_id, renumber_pol, trim
+from ..stack_proof import Proof as StackProof
+
+OPB = """* #variable= 3 #constraint= 5
+1 x1 1 x2 >= 1 ;
+1 ~x1 1 x2 >= 1 ;
+1 x3 1 ~x2 >= 1 ;
+1 ~x3 1 ~x2 >= 1 ;
+1 x1 1 x3 >= 1 ;
+"""
+# step 6 is not needed for the contradiction, 7 and 8 become 6 and 7
+VERIPB = """pseudo-Boolean proof version 1.2
+f 5
+u 1 x3 1 x1 >= 1 ;
+u 1 x2 >= 1 ;
+p 3 4 + 7 2 * +
+c 8
+"""
+SMOL_STEPS = ["u 1 x2 >= 1 ;", "p 3 4 + 6 2 * +"]
+
+
+def write_proof(tmp_path, name, veripb=VERIPB):
+    (tmp_path / (name + ".opb")).write_text(OPB)
+    (tmp_path / (name + ".veripb")).write_text(veripb)
+    return str(tmp_path / name)
+
+
+def smol_lines(path):
+    """
+    :return: the lines of a trimmed proof without the comments.
+    """
+    with open(path) as f:
+        return [line.rstrip("\n") for line in f if not line.startswith("*")]
+
+
+class TestSmolProof:
+    def test_renumber_pol(self):
+        new_numbering = array("q", [0, 1, 2, 3, 0, 4, 5])
+        line = b"p 2 5 + 6 * 6 d 0"
+        assert renumber_pol(line.split(), new_numbering, 3) == b"p 2 4 + 6 * 6 d 0\n"
+
+    def test_renumber_id(self):
+        new_numbering = array("q", [0, 1, 2, 3, 0, 4])
+        assert renumber_id(b"j 5 1 x1 >= 1 ;\n", new_numbering) == b"j 4 1 x1 >= 1 ;\n"
+        with pytest.raises(ValueError):
+            renumber_id(b"c 4\n", new_numbering)
+        with pytest.raises(ValueError):
+            renumber_id(b"c 6\n", new_numbering)
+
+    def test_trim(self, tmp_path):
+        file = write_proof(tmp_path, "proof")
+        save_dir = str(tmp_path) + "/"
+        for backwards, name in [(False, "smol_proof"), (True, "smol_stack_proof")]:
+            recorder = AntecedentRecorder()
+            if backwards:
+                StackProof(file, backwards=True, rup_writer=recorder)
+            else:
+                Proof(file, rup_writer=recorder)
+            kept = reachable(AntecedentGraph.from_dict(recorder.graph))
+            assert [id for id in range(6, 9) if kept[id]] == [7, 8]
+            assert trim(file, save_dir, backwards=backwards) == (3, 2)
+            lines = smol_lines(tmp_path / (name + ".veripb"))
+            assert lines == ["pseudo-Boolean proof version 1.2", "f 5"] + SMOL_STEPS + ["c 7"]
+            (tmp_path / (name + ".opb")).write_text(OPB)
+            recheck = AntecedentRecorder()
+            Proof(str(tmp_path / name), rup_writer=recheck)
+            assert sorted(recheck.graph[6]) == [1, 2]
+            assert sorted(recheck.graph[7]) == [3, 4, 6]
+
+    def test_proof_version(self):
+        assert proof_version(b"pseudo-Boolean proof version 1.2") == (1, 2)
+        assert proof_version(b"pseudo-Boolean proof version 1.10") > (1, 2)
+        assert proof_version(b"pseudo-Boolean proof version 1.0") < (1, 2)
+
+    def test_trim_deletions(self, tmp_path):
+        save_dir = str(tmp_path) + "/"
+        # proofs before version 1.2 end deletions with 0
+        for version, formula, terminator in [("1.2", "f 5", ""), ("1.0", "f 5 0", " 0")]:
+            veripb = VERIPB.replace("1.2", version).replace("f 5", formula)
+            for backwards, name in [(False, "smol_proof"), (True, "smol_stack_proof")]:
+                file = write_proof(tmp_path, "proof", veripb)
+                assert trim(file, save_dir, backwards=backwards, deletions=True) == (3, 2)
+                lines = smol_lines(tmp_path / (name + ".veripb"))
+                # 6 is last used by 7
+                assert lines == (["pseudo-Boolean proof version " + version, formula] + SMOL_STEPS
+                                 + ["d 6" + terminator, "c 7"])
@@ -0,0 +1,75 @@
+from ..antecedent_graph import AntecedentGraph, reachable
+from ..antecedent_writer import AntecedentRecorder
+from ..constraint_arena import STORED
+from ..proof import Proof
+from ..stack_proof import Model, Proof as StackProof
+
+OPB = """* #variable= 3 #constraint= 5
+1 x1 1 x2 >= 1 ;
+1 ~x1 1 x2 >= 1 ;
+1 x3 1 ~x2 >= 1 ;
+1 ~x3 1 ~x2 >= 1 ;
+1 x1 1 x3 >= 1 ;
+"""
+
+
+def write_proof(tmp_path, veripb):
+    (tmp_path / "proof.opb").write_text(OPB)
+    (tmp_path / "proof.veripb").write_text(veripb)
+    return str(tmp_path / "proof")
+
+
+def kept_ids(graph):
+    kept = reachable(AntecedentGraph.from_dict(graph))
+    return [id for id in range(len(kept)) if kept[id]]
+
+
+class TestStackProof:
+    def test_only_core_steps_materialised(self, tmp_path):
+        # 7 and 8 are not needed for the contradiction, 9 only needs its antecedents
+        file = write_proof(tmp_path, """pseudo-Boolean proof version 1.2
+f 5
+u 1 x2 >= 1 ;
+u 1 x3 1 x1 >= 1 ;
+p 1 5 +
+p 3 4 + 6 2 * +
+c 9
+""")
+        recorder = AntecedentRecorder()
+        proof = StackProof(file, backwards=True, rup_writer=recorder)
+        # the other steps are still the handles they were admitted as
+        flags = proof.model.arena.flags
+        assert [id for id in range(6, 10) if flags[id] & STORED] == [6]
+        forward = AntecedentRecorder()
+        Proof(file, rup_writer=forward)
+        assert kept_ids(recorder.graph) == kept_ids(forward.graph) == [1, 2, 3, 4, 6, 9]
+
+    def test_wiped_out_at_solutions(self, tmp_path, monkeypatch):
+        (tmp_path / "levels.opb").write_text("* #variable= 2 #constraint= 1\n1 x1 1 x2 >= 1 ;\n")
+        (tmp_path / "levels.veripb").write_text("""pseudo-Boolean proof version 1.2
+f 1
+# 1
+p 1 1 +
+# 2
+p 2 1 +
+w 2
+v x1 x2
+w 1
+v x1 ~x2
+v ~x1 x2
+u 1 ~x1 >= 1 ;
+u >= 1 ;
+c 8
+""")
+        live_at = {}
+        live_up_to = Model.live_up_to
+
+        def record(model, last_id=None, dead=None):
+            live_at[last_id + 1] = live_up_to(model, last_id, dead)
+            return live_at[last_id + 1]
+        monkeypatch.setattr(Model, "live_up_to", record)
+        recorder = AntecedentRecorder()
+        StackProof(str(tmp_path / "levels"), backwards=True, rup_writer=recorder)
+        # 3 is wiped out before the first solution, 2 before the second
+        assert live_at == {4: [1, 2], 5: [1, 4], 6: [1, 4, 5]}
+        assert kept_ids(recorder.graph) == [1, 4, 5, 6, 7, 8]
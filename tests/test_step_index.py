@@ -0,0 +1,37 @@
+from ..step_index import StepIndex
+
+PROOF = """pseudo-Boolean proof version 1.0
+f 2 0
+# 1
+* a comment
+p 1 2 + 2 d 0
+u 1 x1 1 x2 >= 1 ;
+w 1
+j 3 1 x1 >= 1 ;
+c 5 0
+"""
+
+
+class TestStepIndex:
+    def test_build(self, tmp_path):
+        proof_file = tmp_path / "proof.veripb"
+        proof_file.write_text(PROOF)
+        index = StepIndex.build(str(proof_file))
+        assert len(index) == 3
+        assert index.no_of_formulas == 2
+        assert [index.type(i) for i in (3, 4, 5)] == ["p", "u", "j"]
+        assert index.antecedents(3) == [1, 2]
+        assert index.antecedents(4) == []
+        assert index.antecedents(5) == [3]
+        start, end = index.span(4)
+        assert PROOF.encode()[start:end] == b"u 1 x1 1 x2 >= 1 ;\n"
+        assert list(index.iter_events()) == [(0, "f", 2), (0, "#", 1), (2, "w", 1), (3, "c", 5)]
+
+    def test_reuse(self, tmp_path):
+        proof_file = tmp_path / "proof.veripb"
+        proof_file.write_text(PROOF)
+        built = StepIndex.open(str(proof_file))
+        loaded = StepIndex.load(str(proof_file) + ".idx")
+        assert loaded.source == built.source
+        assert loaded.starts == built.starts and loaded.references == built.references
+        assert loaded.events == built.events
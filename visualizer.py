@@ -1,4 +1,5 @@
 import matplotlib.pyplot as plt
+from antecedent_graph import load_graph, core_ids
 
 def create_graph(numbers, ml, filename='output.png', directory=''):
     max_number = max(numbers)
@@ -32,28 +33,9 @@ def create_graph(numbers, ml, filename='output.png', directory=''):
     plt.close()
 
 def core(file_name):
-    graph_dict = {}
-    with open("rup/"+file_name+".rup", "r") as f:
-        for line in f.readlines():
-            proof_step_id, antecedent = line.split(":")
-            proof_step_id = int(proof_step_id)
-            antecedent = [int(x) for x in antecedent.split()]
-            graph_dict[proof_step_id] = antecedent
-    small_graph = {}
-
-    queue = [max(graph_dict.keys())]
-    model_lines = min(graph_dict.keys())-1
-    steps_to_keep = set()
-    while queue:
-        node = queue.pop()
-        steps_to_keep.add(node)
-        if node not in small_graph:
-            if node in graph_dict:
-                small_graph[node] = graph_dict[node]
-                queue.extend(graph_dict[node])
-            else:
-                small_graph[node] = []
-    return (model_lines, sorted(list(steps_to_keep)))
+    with load_graph("rup/"+file_name+".rup") as graph:
+        model_lines = graph.first-1
+        return (model_lines, core_ids(graph).tolist())
 
 
 if __name__ == "__main__":